@@ -2,44 +2,700 @@
 StreetVoice sv.link 批次工具 - 生成 + 反查
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_file, Response, abort
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
-import requests
-import csv
+from werkzeug.security import safe_join
 import io
 import base64
-import qrcode
-import zipfile
 import os
+import time
+import hashlib
+import mimetypes
+import re
+import threading
+from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
+from typing import Optional
 
-app = Flask(__name__)
+# requests、qrcode、csv、zipfile、sqlite3 等模組在第一次使用時才載入，
+# 只提供頁面的 worker 不需負擔這些載入時間
+
+app = Flask(__name__, static_folder=None)
 CORS(app)
 
+class ResultRecord:
+    """結果紀錄基底：以 __slots__ 儲存，轉為 JSON 時省略未設定的選用欄位
+    
+    子類別各自以 dict 直接列出欄位實作 to_json；回應序列化時每筆都會呼叫，
+    逐欄位 getattr 的通用寫法會明顯拖慢大批結果的回應。
+    """
+    __slots__ = ()
+    
+    def to_json(self):
+        raise NotImplementedError
+
+@dataclass(slots=True)
+class ShortenResult(ResultRecord):
+    """短網址生成結果"""
+    original: str
+    short: str
+    success: bool
+    account: Optional[str] = None
+    
+    def to_json(self):
+        data = {'original': self.original, 'short': self.short, 'success': self.success}
+        if self.account is not None:
+            data['account'] = self.account
+        return data
+
+@dataclass(slots=True)
+class LookupResult(ResultRecord):
+    """短網址反查結果"""
+    link: str
+    id: Optional[str]
+    views: object
+    target: str
+    created: str
+    success: bool
+    account: Optional[str] = None
+    
+    def to_json(self):
+        data = {
+            'link': self.link,
+            'id': self.id,
+            'views': self.views,
+            'target': self.target,
+            'created': self.created,
+            'success': self.success
+        }
+        if self.account is not None:
+            data['account'] = self.account
+        return data
+
+@dataclass(slots=True)
+class DetailsResult(ResultRecord):
+    """短網址詳細資訊（用於修改功能）"""
+    link: str
+    linkId: Optional[str]
+    target: str
+    visit_count: int
+    created_at: str
+    description: str
+    success: bool
+    account: Optional[str] = None
+    
+    def to_json(self):
+        data = {
+            'link': self.link,
+            'linkId': self.linkId,
+            'target': self.target,
+            'visit_count': self.visit_count,
+            'created_at': self.created_at,
+            'description': self.description,
+            'success': self.success
+        }
+        if self.account is not None:
+            data['account'] = self.account
+        return data
+
+@dataclass(slots=True)
+class UpdateResult(ResultRecord):
+    """短網址目標更新結果"""
+    shortUrl: str
+    newTarget: str
+    success: bool
+    message: Optional[str] = None
+    error: Optional[str] = None
+    account: Optional[str] = None
+    
+    def to_json(self):
+        data = {'shortUrl': self.shortUrl, 'newTarget': self.newTarget, 'success': self.success}
+        if self.message is not None:
+            data['message'] = self.message
+        if self.error is not None:
+            data['error'] = self.error
+        if self.account is not None:
+            data['account'] = self.account
+        return data
+
+@dataclass(slots=True)
+class LinkRecord:
+    """sv.link API 回傳的連結資料，只保留用得到的欄位"""
+    address: str
+    id: Optional[str]
+    target: str
+    visit_count: int
+    created_at: str
+    description: str
+    
+    @classmethod
+    def from_api(cls, link):
+        return cls(
+            link.get('address', ''),
+            link.get('id'),
+            link.get('target', ''),
+            link.get('visit_count', 0),
+            link.get('created_at', ''),
+            link.get('description', '')
+        )
+
+class RecordJSONProvider(DefaultJSONProvider):
+    """回應序列化時逐筆轉換結果紀錄，不必先複製成 dict 清單"""
+    
+    @staticmethod
+    def default(o):
+        if isinstance(o, ResultRecord):
+            return o.to_json()
+        return DefaultJSONProvider.default(o)
+
+app.json = RecordJSONProvider(app)
+
+# 靜態檔案：預先計算內容雜湊，帶版本號的網址可長期快取
+# gzip/brotli 壓縮版本由 `flask --app app build-assets` 在部署前產生，請求中不做壓縮
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+ASSET_BUILD_DIR = os.environ.get('ASSET_BUILD_DIR', os.path.join(BASE_DIR, 'build', 'assets'))
+ASSET_PAGES = ('index.html', 'qr-gallery.html')
+ASSET_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+ASSET_MAX_AGE = 31536000
+ASSET_COMPRESS_MIN_SIZE = 1024
+ASSET_COMPRESSIBLE = ('.html', '.css', '.js', '.svg', '.json', '.txt')
+ASSET_REF_RE = re.compile(r'(src|href)="/static/([^"?#]+)"')
+_assets = {}
+
+# 多帳號併發：每個 API Key 各自的速率限制（每秒請求數）與連線池
+# 速率限制預設為 0（不限制）；設定後每個帳號的請求依此排隊，
+# 反查每頁 50 筆，例如 5 次/秒時 10000 筆連結約需 40 秒才能讀完
+ACCOUNT_RATE_LIMIT = float(os.environ.get('ACCOUNT_RATE_LIMIT', 0))
+ACCOUNT_POOL_SIZE = 4
+ACCOUNT_EMAIL_TTL = 600
+MAX_ACCOUNT_WORKERS = int(os.environ.get('MAX_ACCOUNT_WORKERS', 8))
+# 連線與 Email 快取的帳號數上限，超過時移除最久未使用的帳號
+ACCOUNT_CLIENTS_MAX = 32
+ACCOUNT_EMAILS_MAX = 256
+_account_clients = {}
+_account_clients_lock = threading.Lock()
+_account_emails = {}
+
+# 前端分批送出反查時，各批共用同一份連結清單，避免每批重新分頁讀取
+# 每份清單可能很大，只保留最近幾個帳號的結果
+LINKS_CACHE_TTL = 60
+LINKS_CACHE_MAX = 8
+_links_cache = {}
+
+# QR Code：短網址清單保存在前端，伺服器依網址即時生成 SVG，不保存批次狀態
+QR_SVG_CACHE_SIZE = 256
+
+# 觀看次數快照：存於 SQLite，每個帳號以 API Key 雜湊識別
+SNAPSHOT_DB = os.environ.get('SNAPSHOT_DB', os.path.join(BASE_DIR, 'snapshots.db'))
+SNAPSHOT_MIN_INTERVAL = int(os.environ.get('SNAPSHOT_MIN_INTERVAL', 3600))
+SNAPSHOT_TOP_MAX = 1000
+_snapshot_db_ready = False
+
+# 輸入前處理：在呼叫 API 之前先在本地完成標準化與驗證
+URL_RE = re.compile(
+    r'^(?:(https?)://)?((?:[^\s/?#:@.]+\.)+[^\s/?#:@.\d][^\s/?#:@.]*)(:\d{1,5})?([/?#]\S*)?$',
+    re.IGNORECASE
+)
+SHORT_LINK_RE = re.compile(
+    r'^(?:https?://)?(?:www\.)?sv\.link/([A-Za-z0-9_-]+)/*(?:[?#]\S*)?$|^([A-Za-z0-9_-]+)$',
+    re.IGNORECASE
+)
+# 整段比對用：已是標準格式的行由 (原始輸入, 標準化結果) 兩組直接取得，其餘行（第三組）再逐行處理
+# 第三組以貪婪比對取整行（前後空白由 prepare_inputs 去除），避免逐字元回溯
+FAST_URL_RE = re.compile(
+    r'^[ \t]*(?:((https?://(?:[a-z0-9-]+\.)+[a-z][a-z0-9-]*/\S*))[ \t\r]*$|(.*))',
+    re.MULTILINE
+)
+FAST_SHORT_LINK_RE = re.compile(
+    r'^[ \t]*(?:(https://sv\.link/([A-Za-z0-9_-]+))[ \t\r]*$|(.*))',
+    re.MULTILINE
+)
+# 每次點擊都不同的追蹤參數，判斷重複時忽略；utm_* 代表不同的活動來源，視為不同網址
+TRACKING_PARAMS = frozenset([
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid', '_ga', '_gl'
+])
+
+class AccountClient:
+    """單一帳號的 API 連線：獨立的連線池與速率限制"""
+    
+    def __init__(self, api_key, rate_limit):
+        import requests
+        from requests.adapters import HTTPAdapter
+        
+        self.session = requests.Session()
+        self.session.headers['X-API-Key'] = api_key
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=ACCOUNT_POOL_SIZE))
+        self.interval = 1.0 / rate_limit if rate_limit > 0 else 0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+    
+    def request(self, method, url, **kwargs):
+        """依速率限制排隊後送出請求"""
+        if self.interval:
+            with self.lock:
+                now = time.monotonic()
+                slot = max(now, self.next_slot)
+                self.next_slot = slot + self.interval
+            if slot > now:
+                time.sleep(slot - now)
+        return self.session.request(method, url, **kwargs)
+
+def get_account_client(api_key):
+    """取得（或建立）帳號專屬的 API 連線，只保留最近使用的 ACCOUNT_CLIENTS_MAX 個帳號"""
+    with _account_clients_lock:
+        client = _account_clients.pop(api_key, None)
+        if client is None:
+            client = AccountClient(api_key, ACCOUNT_RATE_LIMIT)
+        _account_clients[api_key] = client
+        while len(_account_clients) > ACCOUNT_CLIENTS_MAX:
+            _account_clients.pop(next(iter(_account_clients)))
+        return client
+
+def prune_cache(cache, ttl, max_entries):
+    """移除 (寫入時間, 值) 快取中過期的項目，數量超過上限時從最早寫入的開始移除"""
+    now = time.time()
+    for key, (stored_at, _) in list(cache.items()):
+        if now - stored_at >= ttl:
+            cache.pop(key, None)
+    for key in list(cache)[:max(len(cache) - max_entries, 0)]:
+        cache.pop(key, None)
+
 def get_account_email(api_key):
-    """根據 API Key 獲取帳號 Email"""
+    """根據 API Key 獲取帳號 Email（結果會快取）"""
+    cached = _account_emails.get(api_key)
+    if cached and time.time() - cached[0] < ACCOUNT_EMAIL_TTL:
+        return cached[1]
+    
     try:
-        response = requests.get(
+        response = get_account_client(api_key).request(
+            'GET',
             'https://sv.link/api/v2/account',
-            headers={'X-API-Key': api_key},
             timeout=10
         )
         if response.status_code == 200:
             data = response.json()
-            return data.get('email', '')
+            email = data.get('email', '')
+            _account_emails.pop(api_key, None)
+            _account_emails[api_key] = (time.time(), email)
+            prune_cache(_account_emails, ACCOUNT_EMAIL_TTL, ACCOUNT_EMAILS_MAX)
+            return email
     except:
         pass
     return None
 
+def account_label(api_key, email):
+    """結果中標示帳號用的名稱，沒有 Email 時以 Key 末四碼代替"""
+    return email or f'API Key …{api_key[-4:]}'
+
+def account_groups(data, items_key):
+    """取出請求中的帳號分組，支援單一 api_key 或 accounts 清單；請求格式錯誤時回傳 None"""
+    if not isinstance(data, dict):
+        return None
+    
+    accounts = data.get('accounts')
+    if not accounts:
+        accounts = [data]
+    elif not isinstance(accounts, list) or not all(isinstance(group, dict) for group in accounts):
+        return None
+    return [(group.get('api_key'), group.get(items_key, [])) for group in accounts]
+
+def run_account_groups(groups, process):
+    """各帳號分組併發執行 process，結果依帳號標記後合併為一個回應
+    
+    多帳號時單一帳號出錯只記錄在該帳號的 accounts 項目中，其他帳號的結果照常回傳。
+    """
+    def run(group, isolate=False):
+        api_key, items = group
+        account_email = get_account_email(api_key)
+        try:
+            results, summary = process(api_key, items)
+        except Exception as e:
+            if not isolate:
+                raise
+            return account_email, [], {}, f'處理失敗: {str(e)[:50]}'
+        return account_email, results, summary, None
+    
+    if len(groups) == 1:
+        account_email, results, summary, _ = run(groups[0])
+        response_data = {
+            'results': results,
+            'summary': summary
+        }
+        if account_email:
+            response_data['account_email'] = account_email
+        return response_data
+    
+    from concurrent.futures import ThreadPoolExecutor
+    
+    with ThreadPoolExecutor(max_workers=min(len(groups), MAX_ACCOUNT_WORKERS)) as executor:
+        outcomes = list(executor.map(lambda group: run(group, isolate=True), groups))
+    
+    merged_results = []
+    merged_summary = {}
+    accounts = []
+    
+    for (api_key, _), (account_email, results, summary, error) in zip(groups, outcomes):
+        label = account_label(api_key, account_email)
+        if error:
+            accounts.append({
+                'account': label,
+                'error': error
+            })
+            continue
+        
+        for result in results:
+            result.account = label
+        merged_results.extend(results)
+        
+        for name, value in summary.items():
+            merged_summary[name] = merged_summary.get(name, 0) + value
+        
+        accounts.append({
+            'account': label,
+            'summary': summary
+        })
+    
+    return {
+        'results': merged_results,
+        'summary': merged_summary,
+        'accounts': accounts
+    }
+
+def fetch_all_links(api_key, limit=50, max_skip=None):
+    """分頁讀取帳號下所有連結，回傳 (address 對應 LinkRecord 的 dict, 是否完整讀取)
+    
+    中途出錯時只回傳已讀到的部分；短時間內重複呼叫會使用快取（只快取完整結果）。
+    """
+    cache_key = (api_key, limit, max_skip)
+    cached = _links_cache.get(cache_key)
+    if cached and time.time() - cached[0] < LINKS_CACHE_TTL:
+        return cached[1], True
+    
+    client = get_account_client(api_key)
+    links = {}
+    skip = 0
+    complete = False
+    
+    try:
+        while max_skip is None or skip < max_skip:
+            response = client.request(
+                'GET',
+                f"https://sv.link/api/v2/links?limit={limit}&skip={skip}", 
+                timeout=15
+            )
+            if response.status_code == 200:
+                data = response.json()
+                links_data = data.get('data', [])
+                if not links_data:
+                    complete = True
+                    break
+                # 每頁解析後即捨棄原始 JSON
+                for link in links_data:
+                    record = LinkRecord.from_api(link)
+                    links[record.address] = record
+                skip += limit
+            else:
+                break
+        else:
+            complete = True
+    except Exception as e:
+        print(f"獲取數據時出錯: {e}")
+    
+    # 只快取完整讀取的結果，失敗時下一批重新嘗試
+    if complete:
+        _links_cache.pop(cache_key, None)
+        _links_cache[cache_key] = (time.time(), links)
+        prune_cache(_links_cache, LINKS_CACHE_TTL, LINKS_CACHE_MAX)
+    
+    return links, complete
+
+def invalidate_links_cache(api_key):
+    """連結新增或修改後清除該帳號的快取"""
+    for cache_key in [k for k in list(_links_cache) if k[0] == api_key]:
+        _links_cache.pop(cache_key, None)
+
+def canonicalize_url(url):
+    """標準化目標網址（補上協定、協定與網域轉小寫、移除預設埠號），回傳 (網址, 錯誤訊息)
+    
+    路徑與查詢參數維持使用者輸入的內容。
+    """
+    match = URL_RE.match(url)
+    if not match:
+        return None, '網址格式錯誤'
+    
+    scheme, host, port, rest = match.groups()
+    scheme = scheme.lower() if scheme else 'https'
+    if port == (':80' if scheme == 'http' else ':443'):
+        port = None
+    if not rest:
+        rest = '/'
+    elif rest[0] != '/':
+        rest = '/' + rest
+    
+    return f'{scheme}://{host.lower()}{port or ""}{rest}', None
+
+def url_dedupe_key(url):
+    """判斷重複網址用的鍵：移除 TRACKING_PARAMS 中的點擊追蹤參數，其餘部分不變"""
+    if '?' not in url:
+        return url
+    
+    path, _, query = url.partition('?')
+    query, hash_mark, fragment = query.partition('#')
+    params = [p for p in query.split('&') if p.partition('=')[0].lower() not in TRACKING_PARAMS]
+    if params:
+        path += '?' + '&'.join(params)
+    return path + hash_mark + fragment
+
+def has_tracking_params(lines):
+    """整段輸入中是否可能含有點擊追蹤參數（只比對名稱，沒有時可略過逐行計算 url_dedupe_key）"""
+    try:
+        text = '\n'.join(lines).lower()
+    except TypeError:
+        return True
+    return any(name in text for name in TRACKING_PARAMS)
+
+def short_link_address(link):
+    """從短網址或代碼取出 address，回傳 (address, 錯誤訊息)"""
+    match = SHORT_LINK_RE.match(link)
+    if not match:
+        return None, '短網址格式錯誤'
+    return match.group(1) or match.group(2), None
+
+def prepare_inputs(lines, normalize, fast_re, dedupe_key=None):
+    """批次標準化輸入，回傳 (項目清單, 統計)
+    
+    先以 fast_re 對整段文字做一次比對，已是標準格式的行不需逐行解析；
+    其餘行才交給 normalize 處理。每個輸入都有一個對應項目，順序與輸入相同：
+    (原始輸入, 標準化結果, 錯誤訊息, 重複項目的位置)。空白或非字串的輸入標為格式錯誤。
+    重複判斷使用 dedupe_key(標準化結果)，未指定時直接比對標準化結果。
+    """
+    matches = None
+    try:
+        text = '\n'.join(lines)
+        if text.count('\n') == len(lines) - 1:
+            matches = fast_re.findall(text)
+    except TypeError:
+        pass
+    
+    if matches is None or len(matches) != len(lines):
+        matches = [('', '', line) for line in lines]
+    
+    entries = []
+    append = entries.append
+    first_index = {}.setdefault
+    invalid = 0
+    duplicates = 0
+    
+    for index, (raw, value, rest) in enumerate(matches):
+        if not value:
+            if isinstance(rest, str):
+                raw = rest.strip()
+                value, error = normalize(raw) if raw else (None, '空白輸入')
+            else:
+                raw, value, error = '' if rest is None else str(rest), None, '格式錯誤'
+            
+            if error:
+                invalid += 1
+                append((raw, value, error, None))
+                continue
+        
+        first = first_index(dedupe_key(value) if dedupe_key else value, index)
+        if first == index:
+            append((raw, value, None, None))
+        else:
+            duplicates += 1
+            append((raw, value, None, first))
+    
+    return entries, {'invalid': invalid, 'duplicates': duplicates}
+
+def load_asset(directory, filename):
+    """讀取靜態檔案並計算雜湊、載入預先壓縮的版本，檔案未變更時直接使用快取"""
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        return None
+    
+    mtime = os.stat(path).st_mtime_ns
+    asset = _assets.get(path)
+    
+    # HTML 內引用的靜態檔案版本號改變時也需要重新產生
+    if asset and asset['mtime'] == mtime and all(
+        asset_version(ref) == version for ref, version in asset['refs'].items()
+    ):
+        return asset
+    
+    with open(path, 'rb') as f:
+        body = f.read()
+    
+    refs = {}
+    if filename.endswith('.html'):
+        def versioned(match):
+            ref = match.group(2)
+            version = asset_version(ref)
+            if not version:
+                return match.group(0)
+            refs[ref] = version
+            return f'{match.group(1)}="/static/{ref}?v={version}"'
+        
+        body = ASSET_REF_RE.sub(versioned, body.decode('utf-8')).encode('utf-8')
+    
+    etag = hashlib.sha256(body).hexdigest()[:16]
+    variants = {'identity': body}
+    # 只讀取 build-assets 產生的壓縮檔（以內容雜湊命名），找不到時提供未壓縮版本
+    for encoding, suffix in ASSET_ENCODINGS:
+        compressed_path = os.path.join(ASSET_BUILD_DIR, etag + suffix)
+        if os.path.isfile(compressed_path):
+            with open(compressed_path, 'rb') as f:
+                variants[encoding] = f.read()
+    
+    asset = {
+        'mtime': mtime,
+        'etag': etag,
+        'mimetype': mimetypes.guess_type(path)[0] or 'application/octet-stream',
+        'variants': variants,
+        'refs': refs
+    }
+    _assets[path] = asset
+    return asset
+
+def asset_version(filename):
+    """取得 static 目錄下檔案的內容雜湊"""
+    asset = load_asset(STATIC_DIR, filename)
+    return asset['etag'] if asset else None
+
+@app.cli.command('build-assets')
+def build_assets():
+    """預先產生頁面與靜態檔案的 gzip/brotli 壓縮版本（部署前執行）"""
+    import gzip
+    import brotli
+    
+    filenames = [(BASE_DIR, page) for page in ASSET_PAGES]
+    for root, _, files in os.walk(STATIC_DIR):
+        for name in files:
+            filenames.append((STATIC_DIR, os.path.relpath(os.path.join(root, name), STATIC_DIR)))
+    
+    os.makedirs(ASSET_BUILD_DIR, exist_ok=True)
+    built = 0
+    for directory, filename in filenames:
+        asset = load_asset(directory, filename)
+        body = asset['variants']['identity']
+        if not filename.endswith(ASSET_COMPRESSIBLE) or len(body) < ASSET_COMPRESS_MIN_SIZE:
+            continue
+        
+        for suffix, compressed in (
+            ('.gz', gzip.compress(body, compresslevel=9, mtime=0)),
+            ('.br', brotli.compress(body, quality=11))
+        ):
+            with open(os.path.join(ASSET_BUILD_DIR, asset['etag'] + suffix), 'wb') as f:
+                f.write(compressed)
+        built += 1
+    
+    print(f'已產生 {built} 個檔案的壓縮版本: {ASSET_BUILD_DIR}')
+
+def send_asset(directory, filename, cache_control):
+    """回傳靜態檔案，支援 ETag/304 與預先壓縮的版本"""
+    asset = load_asset(directory, filename)
+    if asset is None:
+        abort(404)
+    
+    encoding = 'identity'
+    for candidate in ('br', 'gzip'):
+        if candidate in asset['variants'] and request.accept_encodings[candidate]:
+            encoding = candidate
+            break
+    
+    etag = asset['etag'] if encoding == 'identity' else f"{asset['etag']}-{encoding}"
+    
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(asset['variants'][encoding], mimetype=asset['mimetype'])
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = cache_control
+    response.vary.add('Accept-Encoding')
+    return response
+
 @app.route('/')
 def index():
     """主頁面"""
-    return send_from_directory('.', 'index.html')
+    return send_asset(BASE_DIR, 'index.html', 'no-cache')
 
 @app.route('/static/<path:filename>')
 def static_files(filename):
-    """靜態檔案服務"""
-    return send_from_directory('static', filename)
+    """靜態檔案服務（帶正確版本號時可長期快取）"""
+    version = request.args.get('v')
+    if version and version == asset_version(filename):
+        cache_control = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    else:
+        cache_control = 'no-cache'
+    return send_asset(STATIC_DIR, filename, cache_control)
+
+def shorten_for_account(api_key, urls):
+    """為單一帳號批次生成短網址，回傳 (結果, 統計)"""
+    import requests
+    
+    # 先在本地標準化與驗證，格式錯誤與重複的網址不會呼叫 API
+    dedupe_key = url_dedupe_key if has_tracking_params(urls) else None
+    entries, input_stats = prepare_inputs(urls, canonicalize_url, FAST_URL_RE, dedupe_key)
+    
+    client = get_account_client(api_key)
+    results = []
+    success_count = 0
+    
+    for raw, url, error, duplicate_of in entries:
+        if error:
+            results.append(ShortenResult(raw, error, False))
+            continue
+        
+        if duplicate_of is not None:
+            result = results[duplicate_of]
+            results.append(ShortenResult(raw, result.short, result.success))
+            success_count += result.success
+            continue
+            
+        try:
+            response = client.request(
+                'POST',
+                'https://sv.link/api/v2/links',
+                json={
+                    'target': url,
+                    'domain': 'sv.link'
+                },
+                timeout=15
+            )
+            
+            if response.status_code == 201:
+                data = response.json()
+                short_url = data.get('shortUrl') or data.get('link') or data.get('id')
+                
+                if short_url and not short_url.startswith('http'):
+                    short_url = f"https://{short_url}"
+                
+                results.append(ShortenResult(raw, short_url, True))
+                success_count += 1
+            else:
+                results.append(ShortenResult(raw, f'HTTP {response.status_code} 錯誤', False))
+                
+        except requests.exceptions.RequestException as e:
+            results.append(ShortenResult(raw, f'請求錯誤: {str(e)[:50]}', False))
+        except Exception as e:
+            results.append(ShortenResult(raw, f'未知錯誤: {str(e)[:50]}', False))
+    
+    if success_count:
+        invalidate_links_cache(api_key)
+    
+    return results, {
+        'total': len(results),
+        'success': success_count,
+        'failed': len(results) - success_count,
+        'invalid': input_stats['invalid'],
+        'duplicates': input_stats['duplicates']
+    }
 
 @app.route('/api/shorten', methods=['POST', 'OPTIONS'])
 def shorten_urls():
@@ -49,90 +705,74 @@ def shorten_urls():
     
     try:
         data = request.get_json()
-        api_key = data.get('api_key')
-        urls = data.get('urls', [])
+        groups = account_groups(data, 'urls')
         
-        if not api_key:
+        if groups is None:
+            return jsonify({'error': '請求格式錯誤'}), 400
+        
+        if any(not api_key or not isinstance(api_key, str) for api_key, _ in groups):
             return jsonify({'error': '缺少 API Key'}), 400
         
-        if not urls:
+        if any(not urls or not isinstance(urls, list) for _, urls in groups):
             return jsonify({'error': '缺少網址清單'}), 400
         
-        # 獲取帳號 Email
-        account_email = get_account_email(api_key)
-        
-        results = []
-        
-        for url in urls:
-            url = url.strip()
-            if not url:
-                continue
-                
-            try:
-                response = requests.post(
-                    'https://sv.link/api/v2/links',
-                    headers={
-                        'Content-Type': 'application/json',
-                        'X-API-Key': api_key
-                    },
-                    json={
-                        'target': url,
-                        'domain': 'sv.link'
-                    },
-                    timeout=15
-                )
-                
-                if response.status_code == 201:
-                    data = response.json()
-                    short_url = data.get('shortUrl') or data.get('link') or data.get('id')
-                    
-                    if short_url and not short_url.startswith('http'):
-                        short_url = f"https://{short_url}"
-                    
-                    results.append({
-                        'original': url,
-                        'short': short_url,
-                        'success': True
-                    })
-                else:
-                    results.append({
-                        'original': url,
-                        'short': f'HTTP {response.status_code} 錯誤',
-                        'success': False
-                    })
-                    
-            except requests.exceptions.RequestException as e:
-                results.append({
-                    'original': url,
-                    'short': f'請求錯誤: {str(e)[:50]}',
-                    'success': False
-                })
-            except Exception as e:
-                results.append({
-                    'original': url,
-                    'short': f'未知錯誤: {str(e)[:50]}',
-                    'success': False
-                })
-        
-        success_count = sum(1 for r in results if r['success'])
-        
-        response_data = {
-            'results': results,
-            'summary': {
-                'total': len(results),
-                'success': success_count,
-                'failed': len(results) - success_count
-            }
-        }
-        
-        if account_email:
-            response_data['account_email'] = account_email
-        
-        return jsonify(response_data)
+        return jsonify(run_account_groups(groups, shorten_for_account))
         
     except Exception as e:
         return jsonify({'error': f'伺服器錯誤: {str(e)}'}), 500
 
+def lookup_for_account(api_key, links):
+    """為單一帳號批次反查短網址，回傳 (結果, 統計)"""
+    # 獲取所有鏈接數據（address 對應 LinkRecord）
+    link_stats, complete = fetch_all_links(api_key, limit=50)
+    
+    # 順便記錄觀看次數快照（距上次快照超過間隔才寫入；只讀到部分連結時不記錄）
+    if complete:
+        try:
+            record_snapshot(api_key, link_stats, min_interval=SNAPSHOT_MIN_INTERVAL)
+        except Exception as e:
+            print(f"記錄快照時出錯: {e}")
+    
+    # 處理反查請求
+    results = []
+    success_count = 0
+    
+    # 先在本地標準化短網址，格式錯誤的項目直接回報
+    entries, input_stats = prepare_inputs(links, short_link_address, FAST_SHORT_LINK_RE)
+    
+    for link_url, short_id, error, _ in entries:
+        if error:
+            results.append(LookupResult(link_url, None, error, '', '', False))
+            continue
+        
+        link_url = f'https://sv.link/{short_id}'
+        
+        try:
+            stats = link_stats.get(short_id)
+            if stats:
+                results.append(LookupResult(
+                    link_url,
+                    stats.id,  # 加入 UUID 欄位
+                    stats.visit_count,
+                    stats.target,
+                    stats.created_at,
+                    True
+                ))
+                success_count += 1
+            else:
+                results.append(LookupResult(link_url, None, 'NOT_FOUND', '', '', False))
+                
+        except Exception as e:
+            results.append(LookupResult(link_url, None, f'錯誤: {str(e)[:30]}', '', '', False))
+    
+    return results, {
+        'total': len(results),
+        'success': success_count,
+        'failed': len(results) - success_count,
+        'invalid': input_stats['invalid'],
+        'duplicates': input_stats['duplicates']
+    }
+
 @app.route('/api/lookup', methods=['POST', 'OPTIONS'])
 def lookup_urls():
     """批次短網址反查 API"""
@@ -141,121 +781,18 @@ def lookup_urls():
     
     try:
         data = request.get_json()
-        api_key = data.get('api_key')
-        links = data.get('links', [])
+        groups = account_groups(data, 'links')
         
-        if not api_key:
+        if groups is None:
+            return jsonify({'error': '請求格式錯誤'}), 400
+        
+        if any(not api_key or not isinstance(api_key, str) for api_key, _ in groups):
             return jsonify({'error': '缺少 API Key'}), 400
         
-        if not links:
+        if any(not links or not isinstance(links, list) for _, links in groups):
             return jsonify({'error': '缺少短網址清單'}), 400
         
-        # 獲取帳號 Email
-        account_email = get_account_email(api_key)
-        
-        headers = {'X-API-Key': api_key}
-        
-        # 先獲取所有鏈接數據
-        def get_all_links():
-            all_links = []
-            skip = 0
-            limit = 50
-            
-            try:
-                while True:
-                    response = requests.get(
-                        f"https://sv.link/api/v2/links?limit={limit}&skip={skip}", 
-                        headers=headers,
-                        timeout=15
-                    )
-                    if response.status_code == 200:
-                        data = response.json()
-                        links_data = data.get('data', [])
-                        if not links_data:
-                            break
-                        all_links.extend(links_data)
-                        skip += limit
-                    else:
-                        break
-            except Exception as e:
-                print(f"獲取數據時出錯: {e}")
-            
-            return all_links
-        
-        # 獲取所有鏈接數據
-        all_links = get_all_links()
-        
-        # 建立地址到統計的映射，包含 UUID
-        link_stats = {}
-        for link in all_links:
-            address = link.get('address', '')
-            link_stats[address] = {
-                'id': link.get('id'),  # 加入 UUID
-                'visit_count': link.get('visit_count', 0),
-                'target': link.get('target', ''),
-                'created_at': link.get('created_at', '')
-            }
-        
-        # 處理反查請求
-        results = []
-        
-        for link_url in links:
-            link_url = link_url.strip()
-            if not link_url:
-                continue
-            
-            try:
-                # 提取短網址 ID
-                if 'sv.link/' in link_url:
-                    short_id = link_url.split('/')[-1]
-                else:
-                    short_id = link_url
-                
-                if short_id in link_stats:
-                    stats = link_stats[short_id]
-                    results.append({
-                        'link': link_url,
-                        'id': stats['id'],  # 加入 UUID 欄位
-                        'views': stats['visit_count'],
-                        'target': stats['target'],
-                        'created': stats['created_at'],
-                        'success': True
-                    })
-                else:
-                    results.append({
-                        'link': link_url,
-                        'id': None,  # 失敗時 ID 為 None
-                        'views': 'NOT_FOUND',
-                        'target': '',
-                        'created': '',
-                        'success': False
-                    })
-                    
-            except Exception as e:
-                results.append({
-                    'link': link_url,
-                    'id': None,  # 錯誤時 ID 為 None
-                    'views': f'錯誤: {str(e)[:30]}',
-                    'target': '',
-                    'created': '',
-                    'success': False
-                })
-        
-        success_count = sum(1 for r in results if r['success'])
-        
-        response_data = {
-            'results': results,
-            'summary': {
-                'total': len(results),
-                'success': success_count,
-                'failed': len(results) - success_count
-            }
-        }
-        
-        if account_email:
-            response_data['account_email'] = account_email
-        
-        return jsonify(response_data)
+        return jsonify(run_account_groups(groups, lookup_for_account))
         
     except Exception as e:
         return jsonify({'error': f'反查失敗: {str(e)}'}), 500
@@ -273,24 +810,33 @@ def export_csv():
         if not results:
             return jsonify({'error': 'No data to export'}), 400
         
+        import csv
+        
         output = io.StringIO()
         writer = csv.writer(output, quoting=csv.QUOTE_MINIMAL)
         
-        writer.writerow(['No', 'Original URL', 'Short URL', 'Status', 'Process Time'])
+        # 多帳號結果加上帳號欄位
+        has_account = any(r.get('account') for r in results)
+        
+        writer.writerow(['No'] + (['Account'] if has_account else []) + ['Original URL', 'Short URL', 'Status', 'Process Time'])
         
         export_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
+        success_count = 0
+        
         for index, result in enumerate(results, 1):
-            writer.writerow([
-                index,
+            success = result.get('success', False)
+            if success:
+                success_count += 1
+            
+            writer.writerow([index] + ([result.get('account', '')] if has_account else []) + [
                 result.get('original', ''),
                 result.get('short', ''),
-                'Success' if result.get('success', False) else 'Failed',
+                'Success' if success else 'Failed',
                 export_time
             ])
         
         total_count = len(results)
-        success_count = sum(1 for r in results if r.get('success', False))
         
         writer.writerow([])
         writer.writerow(['=== Summary ==='])
@@ -321,6 +867,52 @@ def export_csv():
     except Exception as e:
         return jsonify({'error': f'Export failed: {str(e)}'}), 500
 
+def details_for_account(api_key, links):
+    """為單一帳號查詢短網址詳細資訊，回傳 (結果, 統計)"""
+    # 獲取所有鏈接數據（限制搜索範圍）
+    link_details, _ = fetch_all_links(api_key, limit=100, max_skip=2000)
+    
+    # 處理查詢請求
+    results = []
+    success_count = 0
+    
+    # 先在本地標準化短網址，格式錯誤的項目直接回報
+    entries, input_stats = prepare_inputs(links, short_link_address, FAST_SHORT_LINK_RE)
+    
+    for link_url, short_id, error, _ in entries:
+        if error:
+            results.append(DetailsResult(link_url, None, error, 0, '', '', False))
+            continue
+        
+        link_url = f'https://sv.link/{short_id}'
+        
+        try:
+            details = link_details.get(short_id)
+            if details:
+                results.append(DetailsResult(
+                    link_url,
+                    details.id,
+                    details.target,
+                    details.visit_count,
+                    details.created_at,
+                    details.description,
+                    True
+                ))
+                success_count += 1
+            else:
+                results.append(DetailsResult(link_url, None, 'NOT_FOUND', 0, '', '', False))
+                
+        except Exception as e:
+            results.append(DetailsResult(link_url, None, f'錯誤: {str(e)[:30]}', 0, '', '', False))
+    
+    return results, {
+        'total': len(results),
+        'success': success_count,
+        'failed': len(results) - success_count,
+        'invalid': input_stats['invalid'],
+        'duplicates': input_stats['duplicates']
+    }
+
 @app.route('/api/batch-lookup', methods=['POST', 'OPTIONS'])
 def batch_lookup_for_update():
     """批次查詢短網址詳細資訊（用於修改功能）"""
@@ -329,128 +921,97 @@ def batch_lookup_for_update():
     
     try:
         data = request.get_json()
-        api_key = data.get('api_key')
-        links = data.get('links', [])
+        groups = account_groups(data, 'links')
         
-        if not api_key:
+        if groups is None:
+            return jsonify({'error': '請求格式錯誤'}), 400
+        
+        if any(not api_key or not isinstance(api_key, str) for api_key, _ in groups):
             return jsonify({'error': '缺少 API Key'}), 400
         
-        if not links:
+        if any(not links or not isinstance(links, list) for _, links in groups):
             return jsonify({'error': '缺少短網址清單'}), 400
         
-        # 獲取帳號 Email
-        account_email = get_account_email(api_key)
-        
-        headers = {'X-API-Key': api_key}
+        return jsonify(run_account_groups(groups, details_for_account))
         
-        # 獲取所有鏈接數據的函數
-        def get_all_links():
-            all_links = []
-            skip = 0
-            limit = 100
-            
-            try:
-                while skip < 2000:  # 限制搜索範圍
-                    response = requests.get(
-                        f"https://sv.link/api/v2/links?limit={limit}&skip={skip}", 
-                        headers=headers,
-                        timeout=15
-                    )
-                    if response.status_code == 200:
-                        response_data = response.json()
-                        links_data = response_data.get('data', [])
-                        if not links_data:
-                            break
-                        all_links.extend(links_data)
-                        skip += limit
-                    else:
-                        break
-            except Exception as e:
-                print(f"獲取數據時出錯: {e}")
-            
-            return all_links
-        
-        # 獲取所有鏈接數據
-        all_links = get_all_links()
-        
-        # 建立地址到詳細資訊的映射
-        link_details = {}
-        for link in all_links:
-            address = link.get('address', '')
-            link_details[address] = {
-                'id': link.get('id'),
-                'target': link.get('target', ''),
-                'visit_count': link.get('visit_count', 0),
-                'created_at': link.get('created_at', ''),
-                'description': link.get('description', '')
+    except Exception as e:
+        return jsonify({'error': f'查詢失敗: {str(e)}'}), 500
+
+def update_for_account(api_key, changes):
+    """為單一帳號批次更新短網址目標，回傳 (結果, 統計)"""
+    import requests
+    
+    client = get_account_client(api_key)
+    results = []
+    success_count = 0
+    
+    for change in changes:
+        if not isinstance(change, dict):
+            results.append(UpdateResult(None, None, False, error='缺少必要參數'))
+            continue
+        
+        link_id = change.get('linkId')
+        short_url = change.get('shortUrl')
+        new_target = change.get('newTarget')
+        
+        if not link_id or not new_target:
+            results.append(UpdateResult(short_url, new_target, False, error='缺少必要參數'))
+            continue
+        
+        if not isinstance(new_target, str):
+            results.append(UpdateResult(short_url, new_target, False, error='網址格式錯誤'))
+            continue
+        
+        # 本地驗證短網址與新目標，格式錯誤不呼叫 API（與生成短網址送出相同的標準化網址）
+        address, error = short_link_address(str(short_url or '').strip())
+        if not error:
+            target, error = canonicalize_url(new_target.strip())
+        
+        if error:
+            results.append(UpdateResult(short_url, new_target, False, error=error))
+            continue
+        
+        try:
+            # 根據 API 文檔構建請求數據
+            update_data = {
+                'target': target,
+                'address': address
             }
-        
-        # 處理查詢請求
-        results = []
-        
-        for link_url in links:
-            link_url = link_url.strip()
-            if not link_url:
-                continue
             
-            try:
-                # 提取短網址 ID
-                if 'sv.link/' in link_url:
-                    short_id = link_url.split('/')[-1]
-                else:
-                    short_id = link_url
+            # 發送更新請求
+            response = client.request(
+                'PATCH',
+                f'https://sv.link/api/v2/links/{link_id}',
+                json=update_data,
+                timeout=15
+            )
+            
+            if response.status_code == 200:
+                results.append(UpdateResult(short_url, new_target, True, message='更新成功'))
+                success_count += 1
+            else:
+                error_msg = f'HTTP {response.status_code}'
+                try:
+                    error_data = response.json()
+                    error_msg = error_data.get('message', error_msg)
+                except:
+                    pass
                 
-                if short_id in link_details:
-                    details = link_details[short_id]
-                    results.append({
-                        'link': link_url,
-                        'linkId': details['id'],
-                        'target': details['target'],
-                        'visit_count': details['visit_count'],
-                        'created_at': details['created_at'],
-                        'description': details['description'],
-                        'success': True
-                    })
-                else:
-                    results.append({
-                        'link': link_url,
-                        'linkId': None,
-                        'target': 'NOT_FOUND',
-                        'visit_count': 0,
-                        'created_at': '',
-                        'description': '',
-                        'success': False
-                    })
-                    
-            except Exception as e:
-                results.append({
-                    'link': link_url,
-                    'linkId': None,
-                    'target': f'錯誤: {str(e)[:30]}',
-                    'visit_count': 0,
-                    'created_at': '',
-                    'description': '',
-                    'success': False
-                })
-        
-        success_count = sum(1 for r in results if r['success'])
-        
-        response_data = {
-            'results': results,
-            'summary': {
-                'total': len(results),
-                'success': success_count,
-                'failed': len(results) - success_count
-            }
-        }
-        
-        if account_email:
-            response_data['account_email'] = account_email
-        
-        return jsonify(response_data)
-        
-    except Exception as e:
-        return jsonify({'error': f'查詢失敗: {str(e)}'}), 500
+                results.append(UpdateResult(short_url, new_target, False, error=error_msg))
+                
+        except requests.exceptions.RequestException as e:
+            results.append(UpdateResult(short_url, new_target, False, error=f'請求錯誤: {str(e)[:50]}'))
+        except Exception as e:
+            results.append(UpdateResult(short_url, new_target, False, error=f'未知錯誤: {str(e)[:50]}'))
+    
+    if success_count:
+        invalidate_links_cache(api_key)
+    
+    return results, {
+        'total': len(results),
+        'success': success_count,
+        'failed': len(results) - success_count
+    }
 
 @app.route('/api/batch-update', methods=['POST', 'OPTIONS'])
 def batch_update_targets():
@@ -460,112 +1021,18 @@ def batch_update_targets():
     
     try:
         data = request.get_json()
-        api_key = data.get('api_key')
-        changes = data.get('changes', [])
+        groups = account_groups(data, 'changes')
+        
+        if groups is None:
+            return jsonify({'error': '請求格式錯誤'}), 400
         
-        if not api_key:
+        if any(not api_key or not isinstance(api_key, str) for api_key, _ in groups):
             return jsonify({'error': '缺少 API Key'}), 400
         
-        if not changes:
+        if any(not changes or not isinstance(changes, list) for _, changes in groups):
             return jsonify({'error': '沒有要修改的項目'}), 400
         
-        # 獲取帳號 Email
-        account_email = get_account_email(api_key)
-        
-        headers = {
-            'Content-Type': 'application/json',
-            'X-API-Key': api_key
-        }
-        
-        results = []
-        
-        for change in changes:
-            link_id = change.get('linkId')
-            short_url = change.get('shortUrl')
-            new_target = change.get('newTarget')
-            
-            if not link_id or not new_target:
-                results.append({
-                    'shortUrl': short_url,
-                    'newTarget': new_target,
-                    'success': False,
-                    'error': '缺少必要參數'
-                })
-                continue
-            
-            try:
-                # 提取短網址 address
-                if 'sv.link/' in short_url:
-                    address = short_url.split('/')[-1]
-                else:
-                    address = short_url
-                
-                # 根據 API 文檔構建請求數據
-                update_data = {
-                    'target': new_target,
-                    'address': address
-                }
-                
-                # 發送更新請求
-                response = requests.patch(
-                    f'https://sv.link/api/v2/links/{link_id}',
-                    json=update_data,
-                    headers=headers,
-                    timeout=15
-                )
-                
-                if response.status_code == 200:
-                    results.append({
-                        'shortUrl': short_url,
-                        'newTarget': new_target,
-                        'success': True,
-                        'message': '更新成功'
-                    })
-                else:
-                    error_msg = f'HTTP {response.status_code}'
-                    try:
-                        error_data = response.json()
-                        error_msg = error_data.get('message', error_msg)
-                    except:
-                        pass
-                    
-                    results.append({
-                        'shortUrl': short_url,
-                        'newTarget': new_target,
-                        'success': False,
-                        'error': error_msg
-                    })
-                    
-            except requests.exceptions.RequestException as e:
-                results.append({
-                    'shortUrl': short_url,
-                    'newTarget': new_target,
-                    'success': False,
-                    'error': f'請求錯誤: {str(e)[:50]}'
-                })
-            except Exception as e:
-                results.append({
-                    'shortUrl': short_url,
-                    'newTarget': new_target,
-                    'success': False,
-                    'error': f'未知錯誤: {str(e)[:50]}'
-                })
-        
-        success_count = sum(1 for r in results if r['success'])
-        
-        response_data = {
-            'results': results,
-            'summary': {
-                'total': len(results),
-                'success': success_count,
-                'failed': len(results) - success_count
-            }
-        }
-        
-        if account_email:
-            response_data['account_email'] = account_email
-        
-        return jsonify(response_data)
+        return jsonify(run_account_groups(groups, update_for_account))
         
     except Exception as e:
         return jsonify({'error': f'批次更新失敗: {str(e)}'}), 500
@@ -583,19 +1050,29 @@ def export_update_csv():
         if not results:
             return jsonify({'error': 'No data to export'}), 400
         
+        import csv
+        
         output = io.StringIO()
         writer = csv.writer(output, quoting=csv.QUOTE_MINIMAL)
         
-        writer.writerow(['No', 'Short URL', 'New Target URL', 'Status', 'Message', 'Update Time'])
+        # 多帳號結果加上帳號欄位
+        has_account = any(r.get('account') for r in results)
+        
+        writer.writerow(['No'] + (['Account'] if has_account else []) + ['Short URL', 'New Target URL', 'Status', 'Message', 'Update Time'])
         
         export_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
+        success_count = 0
+        
         for index, result in enumerate(results, 1):
-            status = 'Success' if result.get('success', False) else 'Failed'
+            success = result.get('success', False)
+            if success:
+                success_count += 1
+            
+            status = 'Success' if success else 'Failed'
             message = result.get('message', result.get('error', ''))
             
-            writer.writerow([
-                index,
+            writer.writerow([index] + ([result.get('account', '')] if has_account else []) + [
                 result.get('shortUrl', ''),
                 result.get('newTarget', ''),
                 status,
@@ -604,7 +1081,6 @@ def export_update_csv():
             ])
         
         total_count = len(results)
-        success_count = sum(1 for r in results if r.get('success', False))
         
         writer.writerow([])
         writer.writerow(['=== Summary ==='])
@@ -648,25 +1124,34 @@ def export_lookup_csv():
         if not results:
             return jsonify({'error': 'No data to export'}), 400
         
+        import csv
+        
         output = io.StringIO()
         writer = csv.writer(output, quoting=csv.QUOTE_MINIMAL)
         
-        writer.writerow(['No', 'Short URL', 'Views', 'Target URL', 'Created', 'Status'])
+        # 多帳號結果加上帳號欄位
+        has_account = any(r.get('account') for r in results)
+        
+        writer.writerow(['No'] + (['Account'] if has_account else []) + ['Short URL', 'Views', 'Target URL', 'Created', 'Status'])
         
         export_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         
+        success_count = 0
+        
         for index, result in enumerate(results, 1):
-            writer.writerow([
-                index,
+            success = result.get('success', False)
+            if success:
+                success_count += 1
+            
+            writer.writerow([index] + ([result.get('account', '')] if has_account else []) + [
                 result.get('link', ''),
                 result.get('views', ''),
                 result.get('target', ''),
                 result.get('created', ''),
-                'Success' if result.get('success', False) else 'Failed'
+                'Success' if success else 'Failed'
             ])
         
         total_count = len(results)
-        success_count = sum(1 for r in results if r.get('success', False))
         
         writer.writerow([])
         writer.writerow(['=== Summary ==='])
@@ -697,70 +1182,367 @@ def export_lookup_csv():
     except Exception as e:
         return jsonify({'error': f'Export failed: {str(e)}'}), 500
 
-@app.route('/qr-gallery')
-def qr_gallery():
-    """QR Code 展示頁面"""
-    return send_from_directory('.', 'qr-gallery.html')
+def account_key(api_key):
+    """以 API Key 雜湊作為帳號識別，不保存原始 Key"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:32]
 
-@app.route('/api/qr/generate', methods=['POST', 'OPTIONS'])
-def generate_qr_codes():
-    """生成所有 QR Code SVG 資料"""
+def get_snapshot_db():
+    """開啟快照資料庫（首次使用時建立資料表）"""
+    import sqlite3
+    global _snapshot_db_ready
+    
+    conn = sqlite3.connect(SNAPSHOT_DB)
+    if not _snapshot_db_ready:
+        conn.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS links (
+                id INTEGER PRIMARY KEY,
+                account TEXT NOT NULL,
+                address TEXT NOT NULL,
+                UNIQUE (account, address)
+            );
+            CREATE TABLE IF NOT EXISTS snapshots (
+                id INTEGER PRIMARY KEY,
+                account TEXT NOT NULL,
+                taken_at INTEGER NOT NULL,
+                link_count INTEGER NOT NULL,
+                total_visits INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS snapshots_account_time ON snapshots (account, taken_at);
+            CREATE TABLE IF NOT EXISTS visit_counts (
+                snapshot_id INTEGER NOT NULL,
+                link_id INTEGER NOT NULL,
+                visit_count INTEGER NOT NULL,
+                PRIMARY KEY (snapshot_id, link_id)
+            ) WITHOUT ROWID;
+        """)
+        _snapshot_db_ready = True
+    return conn
+
+def record_snapshot(api_key, links, min_interval=0):
+    """寫入一筆觀看次數快照，回傳快照資訊（間隔內已有快照則回傳 None）"""
+    if not links:
+        return None
+    
+    account = account_key(api_key)
+    now = int(time.time())
+    conn = get_snapshot_db()
+    
+    try:
+        with conn:
+            if min_interval:
+                last = conn.execute(
+                    'SELECT MAX(taken_at) FROM snapshots WHERE account = ?', (account,)
+                ).fetchone()[0]
+                if last is not None and now - last < min_interval:
+                    return None
+            
+            counts = {
+                address: int(link.visit_count or 0)
+                for address, link in links.items() if address
+            }
+            
+            conn.executemany(
+                'INSERT OR IGNORE INTO links (account, address) VALUES (?, ?)',
+                ((account, address) for address in counts)
+            )
+            link_ids = dict(conn.execute(
+                'SELECT address, id FROM links WHERE account = ?', (account,)
+            ))
+            
+            cursor = conn.execute(
+                'INSERT INTO snapshots (account, taken_at, link_count, total_visits) VALUES (?, ?, ?, ?)',
+                (account, now, len(counts), sum(counts.values()))
+            )
+            snapshot_id = cursor.lastrowid
+            
+            conn.executemany(
+                'INSERT INTO visit_counts (snapshot_id, link_id, visit_count) VALUES (?, ?, ?)',
+                ((snapshot_id, link_ids[address], count) for address, count in counts.items())
+            )
+        
+        return {
+            'id': snapshot_id,
+            'taken_at': datetime.fromtimestamp(now).isoformat(),
+            'link_count': len(counts),
+            'total_visits': sum(counts.values())
+        }
+    finally:
+        conn.close()
+
+def parse_time(value):
+    """解析 ISO 時間字串為 Unix 秒數"""
+    if not value:
+        return None
+    return int(datetime.fromisoformat(value).timestamp())
+
+@app.route('/api/analytics/snapshot', methods=['POST', 'OPTIONS'])
+def create_snapshot():
+    """立即記錄一筆觀看次數快照（可由排程定期呼叫）"""
     if request.method == 'OPTIONS':
         return '', 200
     
     try:
         data = request.get_json()
-        results = data.get('results', [])
+        if not isinstance(data, dict):
+            return jsonify({'error': '請求格式錯誤'}), 400
         
-        success_results = [r for r in results if r.get('success', False) and r.get('short')]
+        api_key = data.get('api_key')
         
-        if not success_results:
-            return jsonify({'error': '沒有成功的短網址可生成 QR Code'}), 400
+        if not api_key or not isinstance(api_key, str):
+            return jsonify({'error': '缺少 API Key'}), 400
         
-        qr_codes = []
+        invalidate_links_cache(api_key)
+        links, complete = fetch_all_links(api_key, limit=50)
         
-        for index, result in enumerate(success_results, 1):
-            short_url = result.get('short', '')
-            original_url = result.get('original', '')
-            
-            if not short_url:
+        # 部分讀取的清單會讓缺少的連結被當成 0 次觀看，不可寫入快照
+        if not complete:
+            return jsonify({'error': '連結清單讀取不完整，未記錄快照'}), 502
+        
+        snapshot = record_snapshot(api_key, links)
+        if not snapshot:
+            return jsonify({'error': '沒有取得任何連結資料'}), 502
+        
+        return jsonify({'snapshot': snapshot})
+        
+    except Exception as e:
+        return jsonify({'error': f'快照失敗: {str(e)}'}), 500
+
+@app.route('/api/analytics/deltas', methods=['POST', 'OPTIONS'])
+def snapshot_deltas():
+    """依已儲存的快照計算區間內的觀看次數變化（不呼叫 sv.link API）"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        data = request.get_json()
+        if not isinstance(data, dict):
+            return jsonify({'error': '請求格式錯誤'}), 400
+        
+        api_key = data.get('api_key')
+        
+        if not api_key or not isinstance(api_key, str):
+            return jsonify({'error': '缺少 API Key'}), 400
+        
+        try:
+            start = parse_time(data.get('start'))
+            end = parse_time(data.get('end'))
+        except (TypeError, ValueError, OverflowError, OSError):
+            return jsonify({'error': '時間格式錯誤，請使用 ISO 8601'}), 400
+        
+        try:
+            top = min(max(int(data.get('top', 20)), 1), SNAPSHOT_TOP_MAX)
+        except (TypeError, ValueError, OverflowError):
+            return jsonify({'error': 'top 必須為整數'}), 400
+        
+        links = data.get('links', [])
+        if not isinstance(links, list):
+            return jsonify({'error': 'links 必須為短網址清單'}), 400
+        
+        addresses = []
+        for link in links:
+            link = link.strip() if isinstance(link, str) else ''
+            if not link:
                 continue
+            address, error = short_link_address(link)
+            if error:
+                return jsonify({'error': f'{error}: {link}'}), 400
+            addresses.append(address)
+        
+        account = account_key(api_key)
+        conn = get_snapshot_db()
+        
+        try:
+            snapshots = conn.execute(
+                'SELECT id, taken_at, link_count, total_visits FROM snapshots '
+                'WHERE account = ? AND taken_at >= ? AND taken_at <= ? ORDER BY taken_at',
+                (account, start or 0, end or int(time.time()))
+            ).fetchall()
+            
+            if len(snapshots) < 2:
+                return jsonify({'error': '區間內的快照不足兩筆，無法計算變化'}), 404
+            
+            first, last = snapshots[0], snapshots[-1]
+            
+            # 以區間首尾快照計算每個連結的變化
+            movers = conn.execute(
+                'SELECT l.address, COALESCE(s.visit_count, 0), e.visit_count, '
+                'e.visit_count - COALESCE(s.visit_count, 0) AS delta '
+                'FROM visit_counts e '
+                'JOIN links l ON l.id = e.link_id '
+                'LEFT JOIN visit_counts s ON s.snapshot_id = ? AND s.link_id = e.link_id '
+                'WHERE e.snapshot_id = ? ORDER BY delta DESC LIMIT ?',
+                (first[0], last[0], top)
+            ).fetchall()
             
-            try:
-                # 生成 QR Code
-                qr = qrcode.QRCode(
-                    version=1,
-                    error_correction=qrcode.constants.ERROR_CORRECT_M,
-                    box_size=10,
-                    border=4,
+            changed = conn.execute(
+                'SELECT COUNT(*) FROM visit_counts e '
+                'LEFT JOIN visit_counts s ON s.snapshot_id = ? AND s.link_id = e.link_id '
+                'WHERE e.snapshot_id = ? AND e.visit_count != COALESCE(s.visit_count, 0)',
+                (first[0], last[0])
+            ).fetchone()[0]
+            
+            # 指定連結的逐筆時間序列
+            link_series = {}
+            if addresses:
+                placeholders = ','.join('?' * len(addresses))
+                rows = conn.execute(
+                    'SELECT l.address, sn.taken_at, v.visit_count FROM visit_counts v '
+                    'JOIN links l ON l.id = v.link_id '
+                    'JOIN snapshots sn ON sn.id = v.snapshot_id '
+                    f'WHERE l.account = ? AND l.address IN ({placeholders}) '
+                    'AND sn.id IN (SELECT id FROM snapshots WHERE account = ? AND taken_at >= ? AND taken_at <= ?) '
+                    'ORDER BY sn.taken_at',
+                    (account, *addresses, account, first[1], last[1])
                 )
-                qr.add_data(short_url)
-                qr.make(fit=True)
-                
-                # 生成 SVG
-                svg_content = generate_qr_svg(qr, short_url, index)
-                
-                qr_codes.append({
-                    'index': index,
-                    'filename': f'qrcode_{index:03d}.svg',
-                    'svg_content': svg_content,
-                    'short_url': short_url,
-                    'original_url': original_url
-                })
-                
-            except Exception as e:
-                continue
+                for address, taken_at, visit_count in rows:
+                    link_series.setdefault(address, []).append({
+                        'time': datetime.fromtimestamp(taken_at).isoformat(),
+                        'visits': visit_count
+                    })
+        finally:
+            conn.close()
         
         return jsonify({
-            'qr_codes': qr_codes,
-            'total': len(qr_codes)
+            'summary': {
+                'start': datetime.fromtimestamp(first[1]).isoformat(),
+                'end': datetime.fromtimestamp(last[1]).isoformat(),
+                'snapshots': len(snapshots),
+                'total_start': first[3],
+                'total_end': last[3],
+                'total_delta': last[3] - first[3],
+                'links_changed': changed
+            },
+            'top': [
+                {'address': address, 'start': start_count, 'end': end_count, 'delta': delta}
+                for address, start_count, end_count, delta in movers
+            ],
+            'series': [
+                {
+                    'time': datetime.fromtimestamp(taken_at).isoformat(),
+                    'links': link_count,
+                    'visits': total_visits
+                }
+                for _, taken_at, link_count, total_visits in snapshots
+            ],
+            'link_series': link_series
         })
         
     except Exception as e:
-        return jsonify({'error': f'生成失敗: {str(e)}'}), 500
+        return jsonify({'error': f'分析失敗: {str(e)}'}), 500
 
-def generate_qr_svg(qr, url, index):
-    """生成 QR Code SVG"""
+@app.route('/qr-gallery')
+def qr_gallery():
+    """QR Code 展示頁面"""
+    return send_asset(BASE_DIR, 'qr-gallery.html', 'no-cache')
+
+def qr_short_url(link):
+    """驗證並標準化要生成 QR Code 的短網址，回傳 (短網址, 錯誤訊息)"""
+    if not isinstance(link, str):
+        return None, '短網址格式錯誤'
+    address, error = short_link_address(link.strip())
+    if error:
+        return None, error
+    return f'https://sv.link/{address}', None
+
+@app.route('/api/qr/svg')
+def qr_svg():
+    """依短網址生成單一 QR Code SVG（內容只由參數決定，可長期快取）"""
+    short_url, error = qr_short_url(request.args.get('url', ''))
+    if error:
+        return jsonify({'error': error}), 400
+    
+    index = max(request.args.get('index', 1, type=int), 1)
+    response = Response(build_qr_svg(short_url, index), mimetype='image/svg+xml')
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    return response
+
+@app.route('/api/qr/zip', methods=['POST', 'OPTIONS'])
+def qr_zip():
+    """打包下載前端傳來的所有短網址 QR Code"""
+    if request.method == 'OPTIONS':
+        return '', 200
+    
+    try:
+        data = request.get_json(silent=True)
+        urls = data.get('urls') if isinstance(data, dict) else None
+        
+        if not isinstance(urls, list) or not urls:
+            return jsonify({'error': '沒有成功的短網址可生成 QR Code'}), 400
+        
+        short_urls = []
+        for link in urls:
+            short_url, error = qr_short_url(link)
+            if error:
+                return jsonify({'error': f'{error}: {link}'}), 400
+            short_urls.append(short_url)
+        
+        import zipfile
+        
+        buffer = io.BytesIO()
+        
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+            file_list = []
+            for index, short_url in enumerate(short_urls, 1):
+                filename = f'qrcode_{index:03d}.svg'
+                zf.writestr(filename, build_qr_svg(short_url, index))
+                file_list.append(f'- {filename}: {short_url}')
+            
+            readme = (
+                'StreetVoice QR Code 批次下載\n\n'
+                f"生成時間: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                f'總數量: {len(short_urls)} 個 QR Code\n\n'
+                '檔案說明:\n'
+                + '\n'.join(file_list) +
+                '\n\n工具: StreetVoice sv.link 批次短網址生成器\n'
+            )
+            zf.writestr('README.txt', readme)
+        
+        buffer.seek(0)
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        
+        return send_file(
+            buffer,
+            mimetype='application/zip',
+            as_attachment=True,
+            download_name=f'sv-link-qrcodes_{timestamp}.zip'
+        )
+        
+    except Exception as e:
+        return jsonify({'error': f'打包失敗: {str(e)}'}), 500
+
+@lru_cache(maxsize=QR_SVG_CACHE_SIZE)
+def qr_svg_body(short_url):
+    """依短網址生成 QR Code 圖形（以網址為快取鍵，編號註解由 build_qr_svg 加上）"""
+    import qrcode
+    
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(short_url)
+    qr.make(fit=True)
+    
+    return generate_qr_svg(qr)
+
+def build_qr_svg(short_url, index):
+    """生成帶編號與網址註解的 QR Code SVG"""
+    body = qr_svg_body(short_url)
+    
+    if body is None:
+        return f'''<?xml version="1.0" encoding="UTF-8"?>
+<svg xmlns="http://www.w3.org/2000/svg" width="200" height="200" viewBox="0 0 200 200">
+    <rect width="200" height="200" fill="white" stroke="#ccc"/>
+    <text x="100" y="100" text-anchor="middle" font-family="Arial" font-size="12" fill="#000000">QR Code #{index}</text>
+    <text x="100" y="120" text-anchor="middle" font-family="Arial" font-size="8" fill="#666">Generation failed</text>
+</svg>'''
+    
+    return f'{body}\n<!-- QR Code #{index} -->\n<!-- URL: {short_url} -->\n</svg>'
+
+def generate_qr_svg(qr):
+    """生成 QR Code SVG 圖形部分（不含結尾標籤），失敗時回傳 None"""
     try:
         matrix = qr.modules
         size = len(matrix)
@@ -781,21 +1563,10 @@ def generate_qr_svg(qr, url, index):
                     y = (row + 4) * cell_size
                     svg_lines.append(f'<rect x="{x}" y="{y}" width="{cell_size}" height="{cell_size}" fill="#000000"/>')
         
-        svg_lines.extend([
-            f'<!-- QR Code #{index} -->',
-            f'<!-- URL: {url} -->',
-            '</svg>'
-        ])
-        
         return '\n'.join(svg_lines)
         
     except Exception as e:
-        return f'''<?xml version="1.0" encoding="UTF-8"?>
-<svg xmlns="http://www.w3.org/2000/svg" width="200" height="200" viewBox="0 0 200 200">
-    <rect width="200" height="200" fill="white" stroke="#ccc"/>
-    <text x="100" y="100" text-anchor="middle" font-family="Arial" font-size="12" fill="#000000">QR Code #{index}</text>
-    <text x="100" y="120" text-anchor="middle" font-family="Arial" font-size="8" fill="#666">Generation failed</text>
-</svg>'''
+        return None
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 10000))
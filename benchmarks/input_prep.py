@@ -0,0 +1,59 @@
+"""
+輸入前處理基準測試：prepare_inputs 每千行的處理時間
+
+分別測量已是標準格式的網址／短網址（整段比對快速路徑），
+以及需要逐行改寫的網址。網址的情況與 shorten_for_account 相同，
+依 has_tracking_params 決定是否逐行計算 url_dedupe_key，該檢查也計入時間。
+
+    python benchmarks/input_prep.py [行數]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SNAPSHOT_DB', os.path.join(tempfile.mkdtemp(), 'snapshots.db'))
+
+import app as svlink
+
+REPEAT = 20
+
+def prepare_urls(lines):
+    dedupe_key = svlink.url_dedupe_key if svlink.has_tracking_params(lines) else None
+    return svlink.prepare_inputs(lines, svlink.canonicalize_url, svlink.FAST_URL_RE, dedupe_key)
+
+def prepare_short_links(lines):
+    return svlink.prepare_inputs(lines, svlink.short_link_address, svlink.FAST_SHORT_LINK_RE)
+
+def per_thousand(lines, prepare):
+    """回傳每千行的最佳處理時間（毫秒）"""
+    best = None
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        prepare(lines)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000 / len(lines) * 1000
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+
+    cases = [
+        ('標準網址', [f'https://streetvoice.com/artist{i}/songs/{i}/' for i in range(total)], prepare_urls),
+        ('標準網址（含參數）', [f'https://streetvoice.com/artist{i}/?utm_source=fb&id={i}' for i in range(total)],
+         prepare_urls),
+        ('標準網址（含 fbclid）', [f'https://streetvoice.com/artist{i}/?id={i}&fbclid=x{i}' for i in range(total)],
+         prepare_urls),
+        ('標準短網址', [f'https://sv.link/a{i:06d}' for i in range(total)], prepare_short_links),
+        ('待改寫網址', [f'  StreetVoice.com/artist{i}/?utm_source=fb&id={i}' for i in range(total)], prepare_urls),
+        ('待改寫短網址', [f' sv.link/a{i:06d}/ ' for i in range(total)], prepare_short_links),
+    ]
+
+    print(f'行數: {total}')
+    for name, lines, prepare in cases:
+        print(f'{name}: {per_thousand(lines, prepare):.2f} ms / 1000 行')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+反查流程基準測試：比較舊版 dict 結果與精簡結果紀錄的峰值記憶體與執行時間（含回應序列化）
+
+使用模擬的 sv.link 分頁回應，不會連線到外部 API。
+
+    python benchmarks/memory_results.py [筆數]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SNAPSHOT_DB', os.path.join(tempfile.mkdtemp(), 'snapshots.db'))
+
+import app as svlink
+
+PAGE_SIZE = 50
+REPEAT = 7
+
+def upstream_page(skip, total):
+    """模擬 sv.link /api/v2/links 的一頁回應（每次呼叫都產生新的 JSON 物件）"""
+    return [
+        {
+            'id': f'00000000-0000-4000-8000-{i:012d}',
+            'address': f'a{i:06d}',
+            'banned': False,
+            'password': False,
+            'description': '',
+            'domain': 'sv.link',
+            'link': f'https://sv.link/a{i:06d}',
+            'target': f'https://streetvoice.com/artist{i}/songs/{i * 7}/',
+            'visit_count': i % 997,
+            'created_at': '2024-01-01T00:00:00.000Z',
+            'updated_at': '2024-01-02T00:00:00.000Z',
+            'expire_in': None
+        }
+        for i in range(skip, min(skip + PAGE_SIZE, total))
+    ]
+
+def legacy_lookup(total, links):
+    """舊版流程（改用結果紀錄之前的 lookup_for_account）：保留完整 JSON、複製到 link_stats，並建立 dict 結果"""
+    all_links = []
+    skip = 0
+    while True:
+        links_data = upstream_page(skip, total)
+        if not links_data:
+            break
+        all_links.extend(links_data)
+        skip += PAGE_SIZE
+
+    link_stats = {}
+    for link in all_links:
+        address = link.get('address', '')
+        link_stats[address] = {
+            'id': link.get('id'),
+            'visit_count': link.get('visit_count', 0),
+            'target': link.get('target', ''),
+            'created_at': link.get('created_at', '')
+        }
+
+    results = []
+    entries, _ = svlink.prepare_inputs(links, svlink.short_link_address, svlink.FAST_SHORT_LINK_RE)
+    for link_url, short_id, error, _ in entries:
+        if error:
+            results.append({'link': link_url, 'id': None, 'views': error, 'target': '', 'created': '', 'success': False})
+            continue
+
+        link_url = f'https://sv.link/{short_id}'
+        if short_id in link_stats:
+            stats = link_stats[short_id]
+            results.append({
+                'link': link_url,
+                'id': stats['id'],
+                'views': stats['visit_count'],
+                'target': stats['target'],
+                'created': stats['created_at'],
+                'success': True
+            })
+        else:
+            results.append({'link': link_url, 'id': None, 'views': 'NOT_FOUND', 'target': '', 'created': '', 'success': False})
+
+    success_count = sum(1 for r in results if r['success'])
+    return all_links, link_stats, results, success_count
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return {'data': self._data}
+
+class FakeClient:
+    def __init__(self, total):
+        self.total = total
+
+    def request(self, method, url, **kwargs):
+        skip = int(url.rsplit('skip=', 1)[1])
+        return FakeResponse(upstream_page(skip, self.total))
+
+def respond(func):
+    """執行流程並把結果序列化成回應 JSON"""
+    return svlink.app.json.dumps({'results': func()})
+
+def peak_memory(func):
+    tracemalloc.start()
+    respond(func)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+def best_times(*funcs):
+    """交替執行各流程，回傳各自的最佳時間（tracemalloc 會拖慢配置記憶體較多的流程，因此不與峰值一起量）"""
+    best = [None] * len(funcs)
+    for _ in range(REPEAT):
+        for i, func in enumerate(funcs):
+            started = time.perf_counter()
+            respond(func)
+            elapsed = time.perf_counter() - started
+            best[i] = elapsed if best[i] is None else min(best[i], elapsed)
+    return best
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    links = [f'https://sv.link/a{i:06d}' for i in range(total)]
+
+    svlink.get_account_client = lambda api_key: FakeClient(total)
+    svlink.record_snapshot = lambda *args, **kwargs: None
+
+    def compact_lookup():
+        svlink._links_cache.clear()
+        return svlink.lookup_for_account('benchmark', links)[0]
+
+    def legacy():
+        return legacy_lookup(total, links)[2]
+
+    legacy_peak = peak_memory(legacy)
+    compact_peak = peak_memory(compact_lookup)
+    legacy_time, compact_time = best_times(legacy, compact_lookup)
+
+    print(f'筆數: {total}')
+    print(f'舊版 dict 結果: 峰值 {legacy_peak / 1024 / 1024:.1f} MiB, {legacy_time:.2f}s')
+    print(f'精簡結果紀錄:   峰值 {compact_peak / 1024 / 1024:.1f} MiB, {compact_time:.2f}s')
+    print(f'峰值記憶體減少 {(1 - compact_peak / legacy_peak) * 100:.0f}%，'
+          f'執行時間 {(compact_time / legacy_time - 1) * 100:+.0f}%')
+
+if __name__ == '__main__':
+    main()
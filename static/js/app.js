@@ -1,5 +1,102 @@
 // StreetVoice sv.link 批次工具 - 前端邏輯
 
+// 分批送出設定：每批筆數與同時進行的批次數
+// 反查類 API 每批都會讀取整份連結清單，因此採大批次、單一併發
+const CHUNK_CONFIG = {
+    shorten: { size: 50, concurrency: 3 },
+    lookup: { size: 1000, concurrency: 1 },
+    update: { size: 50, concurrency: 3 }
+};
+
+// 超過此筆數時改用虛擬捲動表格，只渲染可見列
+const VIRTUAL_ROW_THRESHOLD = 1000;
+const VIRTUAL_ROW_HEIGHT = 48;
+const VIRTUAL_OVERSCAN = 10;
+
+// 與後端 canonicalize_url / url_dedupe_key 相同的規則，用於跨批次去除重複網址
+const URL_RE = /^(?:(https?):\/\/)?((?:[^\s\/?#:@.]+\.)+[^\s\/?#:@.\d][^\s\/?#:@.]*)(:\d{1,5})?([\/?#]\S*)?$/i;
+const TRACKING_PARAMS = new Set([
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid', '_ga', '_gl'
+]);
+
+// 結果表格：小量資料直接附加列，大量資料只渲染可見範圍
+class ResultTable {
+    constructor(container, headerHtml, renderRow, virtual) {
+        this.container = container;
+        this.renderRow = renderRow;
+        this.virtual = virtual;
+        this.rows = [];
+        this.frame = null;
+
+        container.innerHTML = `
+            <div class="results-summary"></div>
+            <div class="results-viewport${virtual ? ' virtual' : ''}">
+                <div class="results-spacer">
+                    <table class="results-table${virtual ? ' virtual-table' : ''}">
+                        ${headerHtml}
+                        <tbody></tbody>
+                    </table>
+                </div>
+            </div>
+        `;
+
+        this.summary = container.querySelector('.results-summary');
+        this.viewport = container.querySelector('.results-viewport');
+        this.spacer = container.querySelector('.results-spacer');
+        this.table = container.querySelector('table');
+        this.tbody = container.querySelector('tbody');
+
+        if (virtual) {
+            this.viewport.addEventListener('scroll', () => this.scheduleRender());
+        }
+    }
+
+    append(rows) {
+        const start = this.rows.length;
+        for (const row of rows) {
+            this.rows.push(row);
+        }
+
+        if (this.virtual) {
+            this.scheduleRender();
+        } else {
+            const html = rows.map((row, i) => this.renderRow(row, start + i)).join('');
+            this.tbody.insertAdjacentHTML('beforeend', html);
+        }
+    }
+
+    setSummary(html) {
+        this.summary.innerHTML = html;
+    }
+
+    scheduleRender() {
+        if (this.frame !== null) return;
+        this.frame = requestAnimationFrame(() => {
+            this.frame = null;
+            this.renderWindow();
+        });
+    }
+
+    renderWindow() {
+        const headerHeight = this.table.tHead ? this.table.tHead.offsetHeight : 0;
+        const scrollTop = Math.max(0, this.viewport.scrollTop - headerHeight);
+        const first = Math.max(0, Math.floor(scrollTop / VIRTUAL_ROW_HEIGHT) - VIRTUAL_OVERSCAN);
+        const last = Math.min(
+            this.rows.length,
+            Math.ceil((scrollTop + this.viewport.clientHeight) / VIRTUAL_ROW_HEIGHT) + VIRTUAL_OVERSCAN
+        );
+
+        this.spacer.style.height = `${headerHeight + this.rows.length * VIRTUAL_ROW_HEIGHT}px`;
+        this.table.style.transform = `translateY(${first * VIRTUAL_ROW_HEIGHT}px)`;
+
+        let html = '';
+        for (let i = first; i < last; i++) {
+            html += this.renderRow(this.rows[i], i);
+        }
+        this.tbody.innerHTML = html;
+    }
+}
+
 class SVLinkBatchGenerator {
     constructor() {
         this.results = [];
@@ -35,6 +132,11 @@ class SVLinkBatchGenerator {
         document.getElementById('updateConfirmBtn').addEventListener('click', () => this.confirmUpdate());
         document.getElementById('updateExecuteBtn').addEventListener('click', () => this.executeBatchUpdate());
         document.getElementById('updateExportCsv').addEventListener('click', () => this.exportUpdateCsv());
+        document.getElementById('updateEditContainer').addEventListener('input', (e) => {
+            if (e.target.classList.contains('update-input')) {
+                this.updateData[parseInt(e.target.dataset.index)].newTarget = e.target.value;
+            }
+        });
 
         // API Key 同步和自動保存
         document.getElementById('apiKey').addEventListener('input', (e) => {
@@ -174,6 +276,38 @@ class SVLinkBatchGenerator {
         });
     }
 
+    // 判斷重複網址用的鍵（規則同後端 url_dedupe_key），格式錯誤時回傳 null
+    urlDedupeKey(url) {
+        const match = URL_RE.exec(url);
+        if (!match) return null;
+
+        let [, scheme, host, port, rest] = match;
+        scheme = scheme ? scheme.toLowerCase() : 'https';
+        if (port === (scheme === 'http' ? ':80' : ':443')) port = '';
+        if (!rest) {
+            rest = '/';
+        } else if (rest[0] !== '/') {
+            rest = '/' + rest;
+        }
+
+        // 忽略點擊追蹤參數（fbclid 等），utm_* 保留
+        const queryStart = rest.indexOf('?');
+        if (queryStart !== -1) {
+            const path = rest.slice(0, queryStart);
+            let query = rest.slice(queryStart + 1);
+            let fragment = '';
+            const hashStart = query.indexOf('#');
+            if (hashStart !== -1) {
+                fragment = query.slice(hashStart);
+                query = query.slice(0, hashStart);
+            }
+            const params = query.split('&').filter(p => !TRACKING_PARAMS.has(p.split('=')[0].toLowerCase()));
+            rest = path + (params.length ? '?' + params.join('&') : '') + fragment;
+        }
+
+        return `${scheme}://${host.toLowerCase()}${port || ''}${rest}`;
+    }
+
     // Tab 切換功能
     switchTab(tab) {
         // 移除所有 active 狀態
@@ -264,53 +398,97 @@ class SVLinkBatchGenerator {
 
         this.processing = true;
         this.setLoading(true);
-        this.showProgress(true);
+        this.toggleProgress('progress', true);
         this.hideResults();
         this.results = [];
 
+        // 分批送出前先去除重複網址（跨批次也只生成一次），重複的列沿用第一次的結果
+        const uniqueUrls = [];
+        const uniqueIndex = new Map();
+        const rowSource = urls.map(url => {
+            const key = this.urlDedupeKey(url);
+            if (key === null) {
+                uniqueUrls.push(url);
+                return uniqueUrls.length - 1;
+            }
+            if (!uniqueIndex.has(key)) {
+                uniqueIndex.set(key, uniqueUrls.length);
+                uniqueUrls.push(url);
+            }
+            return uniqueIndex.get(key);
+        });
+
+        const table = this.createResultTable('resultList', this.resultHeader(), (result, index) => this.renderResultRow(result, index), urls.length);
+        document.getElementById('results').style.display = 'block';
+
         try {
             this.showStatus(`開始處理 ${urls.length} 個網址...`, 'success');
 
-            const response = await fetch('/api/shorten', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({
-                    api_key: apiKey,
-                    urls: urls
-                })
-            });
-
-            const data = await response.json();
+            const resolved = [];
+            const rowSummary = { total: 0, success: 0, failed: 0, duplicates: 0 };
+            let nextRow = 0;
+            let firstSeen = 0;
 
-            if (response.ok && data.results) {
+            const data = await this.submitInChunks('/api/shorten', { api_key: apiKey }, 'urls', uniqueUrls, CHUNK_CONFIG.shorten, 'progress', (results, summary) => {
                 // 標準化短網址格式
-                data.results.forEach(result => {
+                results.forEach(result => {
                     if (result.success && result.short) {
                         const standardized = this.standardizeShortUrls([result.short]);
                         result.short = standardized[0];
                     }
                 });
-
-                this.results = data.results;
-                this.displayResults(data.results, data.summary);
-                
-                // 保存當前帳號信息
-                if (data.account_email) {
-                    this.saveCurrentAccount(data.account_email);
+                resolved.push(...results);
+
+                // 依原始順序展開已取得結果的列
+                const rows = [];
+                while (nextRow < rowSource.length && rowSource[nextRow] < resolved.length) {
+                    const source = rowSource[nextRow];
+                    const result = resolved[source];
+                    // 不重複的網址依首次出現順序編號，編號小於 firstSeen 即為重複
+                    if (source === firstSeen) {
+                        firstSeen++;
+                        rows.push(result);
+                    } else {
+                        rowSummary.duplicates++;
+                        rows.push({ ...result, original: urls[nextRow] });
+                    }
+                    rowSummary.total++;
+                    rowSummary[result.success ? 'success' : 'failed']++;
+                    nextRow++;
                 }
-            } else {
-                throw new Error(data.error || '處理失敗');
+
+                this.results.push(...rows);
+                table.append(rows);
+                table.setSummary(this.renderSummary({
+                    ...rowSummary,
+                    invalid: summary.invalid,
+                    duplicates: rowSummary.duplicates + (summary.duplicates || 0)
+                }));
+            }, (url, message) => ({ original: url, short: message, success: false }));
+
+            document.getElementById('exportSection').style.display = 'block';
+
+            if (data.failedChunks) {
+                this.showStatus(`${data.failedChunks} 批處理失敗（${data.lastError.message}），其餘結果已列出`, 'error');
+            }
+
+            // 保存當前帳號信息
+            if (data.account_email) {
+                this.saveCurrentAccount(data.account_email);
             }
 
         } catch (error) {
             console.error('處理錯誤:', error);
             this.showStatus(`處理失敗: ${error.message}`, 'error');
+            if (this.results.length > 0) {
+                document.getElementById('exportSection').style.display = 'block';
+            } else {
+                this.hideResults();
+            }
         } finally {
             this.processing = false;
             this.setLoading(false);
-            this.showProgress(false);
+            this.toggleProgress('progress', false);
             this.updateProcessButton(true);
         }
     }
@@ -341,36 +519,33 @@ class SVLinkBatchGenerator {
         links = this.standardizeShortUrls(links);
 
         this.setLookupLoading(true);
-        this.showLookupProgress(true);
+        this.toggleProgress('lookupProgress', true);
+        this.lookupResults = [];
+        document.getElementById('lookupExportSection').style.display = 'none';
 
-        try {
-            const response = await fetch('/api/lookup', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    api_key: apiKey,
-                    links: links
-                })
-            });
+        const table = this.createResultTable('lookupResultList', this.lookupHeader(), (result, index) => this.renderLookupRow(result, index), links.length);
+        document.getElementById('lookupResults').style.display = 'block';
 
-            const data = await response.json();
+        try {
+            const data = await this.submitInChunks('/api/lookup', { api_key: apiKey }, 'links', links, CHUNK_CONFIG.lookup, 'lookupProgress', (results, summary) => {
+                // 標準化回應中的短網址格式
+                results.forEach(result => {
+                    if (result.link) {
+                        const standardized = this.standardizeShortUrls([result.link]);
+                        result.link = standardized[0];
+                    }
+                });
 
-            if (!response.ok) {
-                throw new Error(data.error || '反查失敗');
-            }
+                this.lookupResults.push(...results);
+                table.append(results);
+                table.setSummary(this.renderSummary(summary));
+            }, (link, message) => ({ link, id: null, views: message, target: '', created: '', success: false }));
 
-            // 標準化回應中的短網址格式
-            data.results.forEach(result => {
-                if (result.link) {
-                    const standardized = this.standardizeShortUrls([result.link]);
-                    result.link = standardized[0];
-                }
-            });
+            document.getElementById('lookupExportSection').style.display = 'block';
 
-            this.lookupResults = data.results;
-            this.displayLookupResults(data.results, data.summary);
+            if (data.failedChunks) {
+                alert(`${data.failedChunks} 批反查失敗: ${data.lastError.message}`);
+            }
 
             // 保存當前帳號信息
             if (data.account_email) {
@@ -380,9 +555,14 @@ class SVLinkBatchGenerator {
         } catch (error) {
             alert(`錯誤: ${error.message}`);
             console.error('反查錯誤:', error);
+            if (this.lookupResults.length > 0) {
+                document.getElementById('lookupExportSection').style.display = 'block';
+            } else {
+                document.getElementById('lookupResults').style.display = 'none';
+            }
         } finally {
             this.setLookupLoading(false);
-            this.showLookupProgress(false);
+            this.toggleProgress('lookupProgress', false);
         }
     }
 
@@ -412,37 +592,29 @@ class SVLinkBatchGenerator {
         links = this.standardizeShortUrls(links);
 
         this.setUpdateLookupLoading(true);
-        this.showUpdateLookupProgress(true);
+        this.toggleProgress('updateLookupProgress', true);
 
         try {
-            const response = await fetch('/api/batch-lookup', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    api_key: apiKey,
-                    links: links
-                })
-            });
-
-            const data = await response.json();
-
-            if (!response.ok) {
-                throw new Error(data.error || '查詢失敗');
-            }
+            const updateData = [];
+            const data = await this.submitInChunks('/api/batch-lookup', { api_key: apiKey }, 'links', links, CHUNK_CONFIG.lookup, 'updateLookupProgress', (results) => {
+                // 標準化回應中的短網址格式
+                results.forEach(result => {
+                    if (result.link) {
+                        const standardized = this.standardizeShortUrls([result.link]);
+                        result.link = standardized[0];
+                    }
+                });
 
-            // 標準化回應中的短網址格式
-            data.results.forEach(result => {
-                if (result.link) {
-                    const standardized = this.standardizeShortUrls([result.link]);
-                    result.link = standardized[0];
-                }
-            });
+                updateData.push(...results);
+            }, (link, message) => ({ link, linkId: null, target: message, visit_count: 0, created_at: '', description: '', success: false }));
 
-            this.updateData = data.results;
+            this.updateData = updateData;
             this.showUpdateEditStage();
 
+            if (data.failedChunks) {
+                alert(`${data.failedChunks} 批查詢失敗: ${data.lastError.message}`);
+            }
+
             // 保存當前帳號信息
             if (data.account_email) {
                 this.saveCurrentAccount(data.account_email);
@@ -453,55 +625,56 @@ class SVLinkBatchGenerator {
             console.error('查詢錯誤:', error);
         } finally {
             this.setUpdateLookupLoading(false);
-            this.showUpdateLookupProgress(false);
+            this.toggleProgress('updateLookupProgress', false);
         }
     }
 
     showUpdateEditStage() {
         document.getElementById('updateStage1').style.display = 'none';
         document.getElementById('updateStage2').style.display = 'block';
-        
-        const container = document.getElementById('updateEditContainer');
-        let html = `
-            <div class="update-edit-header">
-                <div class="update-col">短網址</div>
-                <div class="update-col">目前目標</div>
-                <div class="update-col">新目標</div>
-            </div>
-        `;
 
-        this.updateData.forEach((item, index) => {
-            const shortUrl = item.link;
-            const currentTarget = item.success ? item.target : '查詢失敗';
-            const statusClass = item.success ? 'success' : 'failed';
-            
-            html += `
-                <div class="update-edit-row ${statusClass}">
-                    <div class="update-col short-url">${shortUrl}</div>
-                    <div class="update-col current-target">${currentTarget}</div>
-                    <div class="update-col new-target">
-                        ${item.success ? 
-                            `<input type="text" class="update-input" data-index="${index}" placeholder="輸入新的目標網址">` : 
-                            '<span class="error-text">無法修改</span>'
-                        }
-                    </div>
-                </div>
-            `;
-        });
+        // 輸入的新目標存回 updateData，虛擬捲動移除的列重新渲染時仍保留內容
+        const table = this.createResultTable('updateEditContainer', this.editHeader(), (item, index) => this.renderEditRow(item, index), this.updateData.length);
+        table.append(this.updateData);
+    }
+
+    editHeader() {
+        return `
+            <thead>
+                <tr>
+                    <th>短網址</th>
+                    <th>目前目標</th>
+                    <th>新目標</th>
+                </tr>
+            </thead>
+        `;
+    }
 
-        container.innerHTML = html;
+    renderEditRow(item, index) {
+        const currentTarget = item.success ? item.target : '查詢失敗';
+        const newTarget = (item.newTarget || '').replace(/&/g, '&amp;').replace(/"/g, '&quot;').replace(/</g, '&lt;');
+
+        return `
+            <tr>
+                <td class="url-cell short-url">${item.link}</td>
+                <td class="url-cell original-url">${currentTarget}</td>
+                <td>
+                    ${item.success ?
+                        `<input type="text" class="update-input" data-index="${index}" value="${newTarget}" placeholder="輸入新的目標網址">` :
+                        '<span class="error-text">無法修改</span>'
+                    }
+                </td>
+            </tr>
+        `;
     }
 
     confirmUpdate() {
-        const inputs = document.querySelectorAll('.update-input');
         const changes = [];
 
-        inputs.forEach(input => {
-            const index = parseInt(input.dataset.index);
-            const newTarget = input.value.trim();
-            
-            if (newTarget) {
-                const item = this.updateData[index];
+        this.updateData.forEach((item, index) => {
+            const newTarget = (item.newTarget || '').trim();
+
+            if (item.success && newTarget) {
                 changes.push({
                     index: index,
                     shortUrl: item.link,
@@ -523,32 +696,37 @@ class SVLinkBatchGenerator {
     showUpdateConfirmStage(changes) {
         document.getElementById('updateStage2').style.display = 'none';
         document.getElementById('updateStage3').style.display = 'block';
-        
-        const container = document.getElementById('updateConfirmList');
-        let html = `
+
+        const table = this.createResultTable('updateConfirmList', this.confirmHeader(), (change) => this.renderConfirmRow(change), changes.length);
+        table.setSummary(`
             <div class="update-confirm-summary">
                 即將修改 ${changes.length} 個短網址：
             </div>
-        `;
+        `);
+        table.append(changes);
+        this.pendingChanges = changes;
+    }
 
-        changes.forEach((change) => {
-            html += `
-                <div class="update-confirm-item">
-                    <div class="confirm-row">
-                        <strong>${change.shortUrl}</strong>
-                    </div>
-                    <div class="confirm-row">
-                        <span class="label">目前：</span>${change.currentTarget}
-                    </div>
-                    <div class="confirm-row">
-                        <span class="label">修改為：</span>${change.newTarget}
-                    </div>
-                </div>
-            `;
-        });
+    confirmHeader() {
+        return `
+            <thead>
+                <tr>
+                    <th>短網址</th>
+                    <th>目前</th>
+                    <th>修改為</th>
+                </tr>
+            </thead>
+        `;
+    }
 
-        container.innerHTML = html;
-        this.pendingChanges = changes;
+    renderConfirmRow(change) {
+        return `
+            <tr>
+                <td class="url-cell short-url">${change.shortUrl}</td>
+                <td class="url-cell original-url">${change.currentTarget}</td>
+                <td class="url-cell original-url">${change.newTarget}</td>
+            </tr>
+        `;
     }
 
     async executeBatchUpdate() {
@@ -560,36 +738,33 @@ class SVLinkBatchGenerator {
         }
 
         this.setUpdateExecuteLoading(true);
-        this.showUpdateExecuteProgress(true);
+        this.toggleProgress('updateExecuteProgress', true);
+        this.updateResults = [];
+
+        const table = this.createResultTable('updateResultList', this.updateHeader(), (result, index) => this.renderUpdateRow(result, index), changes.length);
+        document.getElementById('updateStage3').style.display = 'none';
+        document.getElementById('updateResults').style.display = 'block';
 
         try {
-            const response = await fetch('/api/batch-update', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({
-                    api_key: document.getElementById('updateApiKey').value.trim(),
-                    changes: changes
-                })
-            });
+            const data = await this.submitInChunks('/api/batch-update', { api_key: document.getElementById('updateApiKey').value.trim() }, 'changes', changes, CHUNK_CONFIG.update, 'updateExecuteProgress', (results, summary) => {
+                // 標準化回應中的短網址格式
+                results.forEach(result => {
+                    if (result.shortUrl) {
+                        const standardized = this.standardizeShortUrls([result.shortUrl]);
+                        result.shortUrl = standardized[0];
+                    }
+                });
 
-            const data = await response.json();
+                this.updateResults.push(...results);
+                table.append(results);
+                table.setSummary(this.renderSummary(summary));
+            }, (change, message) => ({ shortUrl: change.shortUrl, newTarget: change.newTarget, success: false, error: message }));
 
-            if (!response.ok) {
-                throw new Error(data.error || '修改失敗');
-            }
+            document.getElementById('updateExportSection').style.display = 'block';
 
-            // 標準化回應中的短網址格式
-            data.results.forEach(result => {
-                if (result.shortUrl) {
-                    const standardized = this.standardizeShortUrls([result.shortUrl]);
-                    result.shortUrl = standardized[0];
-                }
-            });
-
-            this.updateResults = data.results;
-            this.showUpdateResults(data.results, data.summary);
+            if (data.failedChunks) {
+                alert(`${data.failedChunks} 批修改失敗: ${data.lastError.message}`);
+            }
 
             // 保存當前帳號信息
             if (data.account_email) {
@@ -599,9 +774,15 @@ class SVLinkBatchGenerator {
         } catch (error) {
             alert(`錯誤: ${error.message}`);
             console.error('修改錯誤:', error);
+            if (this.updateResults.length > 0) {
+                document.getElementById('updateExportSection').style.display = 'block';
+            } else {
+                document.getElementById('updateResults').style.display = 'none';
+                document.getElementById('updateStage3').style.display = 'block';
+            }
         } finally {
             this.setUpdateExecuteLoading(false);
-            this.showUpdateExecuteProgress(false);
+            this.toggleProgress('updateExecuteProgress', false);
         }
     }
 
@@ -659,160 +840,212 @@ class SVLinkBatchGenerator {
     }
 
     // 進度條管理
-    showProgress(show) {
-        const progress = document.getElementById('progress');
-        const progressBar = document.getElementById('progressBar');
-        
+    toggleProgress(id, show) {
+        const progress = document.getElementById(id);
+        const progressBar = document.getElementById(`${id}Bar`);
+        const stats = document.getElementById(`${id}Stats`);
+
         progress.style.display = show ? 'block' : 'none';
-        
-        if (show) {
-            progressBar.style.width = '30%';
-            setTimeout(() => progressBar.style.width = '60%', 500);
-            setTimeout(() => progressBar.style.width = '90%', 1000);
-        } else {
-            progressBar.style.width = '100%';
-            setTimeout(() => progressBar.style.width = '0%', 300);
-        }
+        stats.style.display = show ? 'block' : 'none';
+        stats.textContent = '';
+        progressBar.style.width = '0%';
     }
 
-    showLookupProgress(show) {
-        const progress = document.getElementById('lookupProgress');
-        const progressBar = document.getElementById('lookupProgressBar');
-        
-        progress.style.display = show ? 'block' : 'none';
-        if (show) {
-            progressBar.style.width = '0%';
-            setTimeout(() => progressBar.style.width = '100%', 100);
-        }
+    updateProgressStats(id, done, total, startedAt) {
+        const progressBar = document.getElementById(`${id}Bar`);
+        const stats = document.getElementById(`${id}Stats`);
+
+        const elapsed = (performance.now() - startedAt) / 1000;
+        const rate = elapsed > 0 ? done / elapsed : 0;
+        const remaining = rate > 0 ? (total - done) / rate : 0;
+
+        progressBar.style.width = `${(done / total * 100).toFixed(1)}%`;
+        stats.textContent = `已完成 ${done} / ${total} · ${rate.toFixed(1)} 筆/秒 · 預估剩餘 ${this.formatDuration(remaining)}`;
     }
 
-    showUpdateLookupProgress(show) {
-        const progress = document.getElementById('updateLookupProgress');
-        const progressBar = document.getElementById('updateLookupProgressBar');
-        
-        progress.style.display = show ? 'block' : 'none';
-        if (show) {
-            progressBar.style.width = '0%';
-            setTimeout(() => progressBar.style.width = '100%', 100);
+    formatDuration(seconds) {
+        seconds = Math.ceil(seconds);
+        if (seconds < 60) {
+            return `${seconds} 秒`;
         }
+        const minutes = Math.floor(seconds / 60);
+        return `${minutes} 分 ${String(seconds % 60).padStart(2, '0')} 秒`;
     }
 
-    showUpdateExecuteProgress(show) {
-        const progress = document.getElementById('updateExecuteProgress');
-        const progressBar = document.getElementById('updateExecuteProgressBar');
-        
-        progress.style.display = show ? 'block' : 'none';
-        if (show) {
-            progressBar.style.width = '0%';
-            setTimeout(() => progressBar.style.width = '100%', 100);
+    // 分批送出：依 config 切分 items，限制同時進行的批次數，並依原始順序回傳結果
+    // 某批失敗時以 failedRow 將該批每一筆轉為失敗列，其餘批次照常處理與合併
+    async submitInChunks(endpoint, baseBody, key, items, config, progressId, onResults, failedRow) {
+        const chunks = [];
+        for (let i = 0; i < items.length; i += config.size) {
+            chunks.push(items.slice(i, i + config.size));
+        }
+
+        const completed = new Array(chunks.length);
+        const summary = { total: 0, success: 0, failed: 0 };
+        const startedAt = performance.now();
+        let accountEmail = null;
+        let nextChunk = 0;
+        let nextToMerge = 0;
+        let doneItems = 0;
+        let failedChunks = 0;
+        let lastError = null;
+
+        const worker = async () => {
+            while (nextChunk < chunks.length) {
+                const index = nextChunk++;
+
+                try {
+                    const response = await fetch(endpoint, {
+                        method: 'POST',
+                        headers: {
+                            'Content-Type': 'application/json'
+                        },
+                        body: JSON.stringify({ ...baseBody, [key]: chunks[index] })
+                    });
+
+                    const data = await response.json();
+
+                    if (!response.ok || !data.results) {
+                        throw new Error(data.error || `HTTP ${response.status}`);
+                    }
+
+                    completed[index] = data;
+                } catch (error) {
+                    console.error(`第 ${index + 1} 批處理失敗:`, error);
+                    failedChunks++;
+                    lastError = error;
+                    const message = `批次失敗: ${error.message}`;
+                    completed[index] = {
+                        results: chunks[index].map(item => failedRow(item, message)),
+                        summary: { total: chunks[index].length, success: 0, failed: chunks[index].length }
+                    };
+                }
+
+                doneItems += chunks[index].length;
+
+                // 依原始順序合併已完成的批次
+                while (nextToMerge < chunks.length && completed[nextToMerge]) {
+                    const data = completed[nextToMerge];
+                    completed[nextToMerge] = null;
+                    nextToMerge++;
+
+                    for (const [name, value] of Object.entries(data.summary)) {
+                        summary[name] = (summary[name] || 0) + value;
+                    }
+                    if (data.account_email) {
+                        accountEmail = data.account_email;
+                    }
+
+                    onResults(data.results, { ...summary });
+                }
+
+                this.updateProgressStats(progressId, doneItems, items.length, startedAt);
+            }
+        };
+
+        const workers = [];
+        for (let i = 0; i < Math.min(config.concurrency, chunks.length); i++) {
+            workers.push(worker());
         }
+        await Promise.all(workers);
+
+        return { summary, account_email: accountEmail, failedChunks, lastError };
     }
 
     // 結果顯示
-    displayResults(resultsData, summary) {
-        let html = `
-            <table class="results-table">
-                <thead>
-                    <tr>
-                        <th style="width: 80px;">狀態</th>
-                        <th style="width: 60px;">編號</th>
-                        <th>原始網址</th>
-                        <th>短網址</th>
-                        <th style="width: 90px;">操作</th>
-                    </tr>
-                </thead>
-                <tbody>
-        `;
-
-        resultsData.forEach((result, index) => {
-            const statusClass = result.success ? 'status-success' : 'status-failed';
-            const statusText = result.success ? '成功' : '失敗';
-            const copyButton = result.success ? 
-                `<button class="copy-btn" onclick="app.copyToClipboard('${result.short}', this)">複製</button>` : 
-                '<span style="color: #ccc;">-</span>';
-            
-            html += `
-                <tr>
-                    <td><span class="status-badge ${statusClass}">${statusText}</span></td>
-                    <td><span class="row-number">${index + 1}</span></td>
-                    <td class="url-cell original-url">${result.original}</td>
-                    <td class="url-cell short-url">${result.short}</td>
-                    <td>${copyButton}</td>
-                </tr>
-            `;
-        });
+    createResultTable(containerId, headerHtml, renderRow, expectedRows) {
+        return new ResultTable(
+            document.getElementById(containerId),
+            headerHtml,
+            renderRow,
+            expectedRows > VIRTUAL_ROW_THRESHOLD
+        );
+    }
 
-        html += '</tbody></table>';
-        
-        const summaryHtml = `
+    renderSummary(summary) {
+        return `
             <div style="display: flex; gap: 20px; justify-content: center; margin-bottom: 20px; padding: 15px; background: #f8f9fa; border-radius: 8px;">
                 <div><span style="color: #6c757d; margin-right: 5px;">總數:</span><span style="font-weight: 600; color: #333;">${summary.total}</span></div>
                 <div><span style="color: #6c757d; margin-right: 5px;">成功:</span><span style="font-weight: 600; color: #28a745;">${summary.success}</span></div>
                 <div><span style="color: #6c757d; margin-right: 5px;">失敗:</span><span style="font-weight: 600; color: #dc3545;">${summary.failed}</span></div>
+                ${summary.invalid ? `<div><span style="color: #6c757d; margin-right: 5px;">格式錯誤:</span><span style="font-weight: 600; color: #dc3545;">${summary.invalid}</span></div>` : ''}
+                ${summary.duplicates ? `<div><span style="color: #6c757d; margin-right: 5px;">重複:</span><span style="font-weight: 600; color: #6c757d;">${summary.duplicates}</span></div>` : ''}
             </div>
         `;
+    }
 
-        document.getElementById('resultList').innerHTML = summaryHtml + html;
-        document.getElementById('results').style.display = 'block';
-        document.getElementById('exportSection').style.display = 'block';
+    resultHeader() {
+        return `
+            <thead>
+                <tr>
+                    <th style="width: 80px;">狀態</th>
+                    <th style="width: 60px;">編號</th>
+                    <th>原始網址</th>
+                    <th>短網址</th>
+                    <th style="width: 90px;">操作</th>
+                </tr>
+            </thead>
+        `;
     }
 
-    displayLookupResults(resultsData, summary) {
-        let html = `
-            <table class="results-table">
-                <thead>
-                    <tr>
-                        <th style="width: 80px;">狀態</th>
-                        <th style="width: 60px;">編號</th>
-                        <th>短網址</th>
-                        <th>目標網址</th>
-                        <th style="width: 100px;">觀看次數</th>
-                        <th style="width: 90px;">操作</th>
-                    </tr>
-                </thead>
-                <tbody>
+    renderResultRow(result, index) {
+        const statusClass = result.success ? 'status-success' : 'status-failed';
+        const statusText = result.success ? '成功' : '失敗';
+        const copyButton = result.success ? 
+            `<button class="copy-btn" onclick="app.copyToClipboard('${result.short}', this)">複製</button>` : 
+            '<span style="color: #ccc;">-</span>';
+        
+        return `
+            <tr>
+                <td><span class="status-badge ${statusClass}">${statusText}</span></td>
+                <td><span class="row-number">${index + 1}</span></td>
+                <td class="url-cell original-url">${result.original}</td>
+                <td class="url-cell short-url">${result.short}</td>
+                <td>${copyButton}</td>
+            </tr>
         `;
+    }
 
-        resultsData.forEach((result, index) => {
-            const statusClass = result.success ? 'status-success' : 'status-failed';
-            const statusText = result.success ? '成功' : '失敗';
-            
-            // 判斷是否顯示查看詳情按鈕
-            let actionButton = '<span style="color: #ccc;">-</span>';
-            
-            if (result.success) {
-                const viewCount = parseInt(result.views) || 0;
-                if (viewCount > 0 && result.id) {
-                    // 使用後端提供的正確 UUID 來建構 stats URL
-                    actionButton = `<button class="details-btn" onclick="app.openStatsPage('${result.id}')">查看詳情</button>`;
-                }
-            }
-            
-            html += `
+    lookupHeader() {
+        return `
+            <thead>
                 <tr>
-                    <td><span class="status-badge ${statusClass}">${statusText}</span></td>
-                    <td><span class="row-number">${index + 1}</span></td>
-                    <td class="url-cell short-url">${result.link}</td>
-                    <td class="url-cell original-url">${result.target}</td>
-                    <td style="text-align: center; font-weight: 600; color: #FF6B6B;">${result.views}</td>
-                    <td>${actionButton}</td>
+                    <th style="width: 80px;">狀態</th>
+                    <th style="width: 60px;">編號</th>
+                    <th>短網址</th>
+                    <th>目標網址</th>
+                    <th style="width: 100px;">觀看次數</th>
+                    <th style="width: 90px;">操作</th>
                 </tr>
-            `;
-        });
+            </thead>
+        `;
+    }
 
-        html += '</tbody></table>';
+    renderLookupRow(result, index) {
+        const statusClass = result.success ? 'status-success' : 'status-failed';
+        const statusText = result.success ? '成功' : '失敗';
         
-        const summaryHtml = `
-            <div style="display: flex; gap: 20px; justify-content: center; margin-bottom: 20px; padding: 15px; background: #f8f9fa; border-radius: 8px;">
-                <div><span style="color: #6c757d; margin-right: 5px;">總數:</span><span style="font-weight: 600; color: #333;">${summary.total}</span></div>
-                <div><span style="color: #6c757d; margin-right: 5px;">成功:</span><span style="font-weight: 600; color: #28a745;">${summary.success}</span></div>
-                <div><span style="color: #6c757d; margin-right: 5px;">失敗:</span><span style="font-weight: 600; color: #dc3545;">${summary.failed}</span></div>
-            </div>
+        // 判斷是否顯示查看詳情按鈕
+        let actionButton = '<span style="color: #ccc;">-</span>';
+        
+        if (result.success) {
+            const viewCount = parseInt(result.views) || 0;
+            if (viewCount > 0 && result.id) {
+                // 使用後端提供的正確 UUID 來建構 stats URL
+                actionButton = `<button class="details-btn" onclick="app.openStatsPage('${result.id}')">查看詳情</button>`;
+            }
+        }
+        
+        return `
+            <tr>
+                <td><span class="status-badge ${statusClass}">${statusText}</span></td>
+                <td><span class="row-number">${index + 1}</span></td>
+                <td class="url-cell short-url">${result.link}</td>
+                <td class="url-cell original-url">${result.target}</td>
+                <td style="text-align: center; font-weight: 600; color: #FF6B6B;">${result.views}</td>
+                <td>${actionButton}</td>
+            </tr>
         `;
-
-        document.getElementById('lookupResultList').innerHTML = summaryHtml + html;
-        document.getElementById('lookupResults').style.display = 'block';
-        document.getElementById('lookupExportSection').style.display = 'block';
     }
 
     // 開啟統計頁面功能
@@ -822,54 +1055,36 @@ class SVLinkBatchGenerator {
         window.open(statsUrl, '_blank');
     }
 
-    showUpdateResults(resultsData, summary) {
-        document.getElementById('updateStage3').style.display = 'none';
-        
-        let html = `
-            <table class="results-table">
-                <thead>
-                    <tr>
-                        <th style="width: 80px;">狀態</th>
-                        <th style="width: 60px;">編號</th>
-                        <th>短網址</th>
-                        <th>新目標網址</th>
-                        <th style="width: 90px;">操作</th>
-                    </tr>
-                </thead>
-                <tbody>
-        `;
-
-        resultsData.forEach((result, index) => {
-            const statusClass = result.success ? 'status-success' : 'status-failed';
-            const statusText = result.success ? '成功' : '失敗';
-            const copyButton = result.success ? 
-                `<button class="copy-btn" onclick="app.copyToClipboard('${result.shortUrl}', this)">複製</button>` : 
-                '<span style="color: #ccc;">-</span>';
-            
-            html += `
+    updateHeader() {
+        return `
+            <thead>
                 <tr>
-                    <td><span class="status-badge ${statusClass}">${statusText}</span></td>
-                    <td><span class="row-number">${index + 1}</span></td>
-                    <td class="url-cell short-url">${result.shortUrl}</td>
-                    <td class="url-cell original-url">${result.newTarget}</td>
-                    <td>${copyButton}</td>
+                    <th style="width: 80px;">狀態</th>
+                    <th style="width: 60px;">編號</th>
+                    <th>短網址</th>
+                    <th>新目標網址</th>
+                    <th style="width: 90px;">操作</th>
                 </tr>
-            `;
-        });
+            </thead>
+        `;
+    }
 
-        html += '</tbody></table>';
+    renderUpdateRow(result, index) {
+        const statusClass = result.success ? 'status-success' : 'status-failed';
+        const statusText = result.success ? '成功' : '失敗';
+        const copyButton = result.success ? 
+            `<button class="copy-btn" onclick="app.copyToClipboard('${result.shortUrl}', this)">複製</button>` : 
+            '<span style="color: #ccc;">-</span>';
         
-        const summaryHtml = `
-            <div style="display: flex; gap: 20px; justify-content: center; margin-bottom: 20px; padding: 15px; background: #f8f9fa; border-radius: 8px;">
-                <div><span style="color: #6c757d; margin-right: 5px;">總數:</span><span style="font-weight: 600; color: #333;">${summary.total}</span></div>
-                <div><span style="color: #6c757d; margin-right: 5px;">成功:</span><span style="font-weight: 600; color: #28a745;">${summary.success}</span></div>
-                <div><span style="color: #6c757d; margin-right: 5px;">失敗:</span><span style="font-weight: 600; color: #dc3545;">${summary.failed}</span></div>
-            </div>
+        return `
+            <tr>
+                <td><span class="status-badge ${statusClass}">${statusText}</span></td>
+                <td><span class="row-number">${index + 1}</span></td>
+                <td class="url-cell short-url">${result.shortUrl}</td>
+                <td class="url-cell original-url">${result.newTarget}</td>
+                <td>${copyButton}</td>
+            </tr>
         `;
-
-        document.getElementById('updateResultList').innerHTML = summaryHtml + html;
-        document.getElementById('updateResults').style.display = 'block';
-        document.getElementById('updateExportSection').style.display = 'block';
     }
 
     hideResults() {
@@ -974,7 +1189,7 @@ class SVLinkBatchGenerator {
         }
     }
 
-    async exportQrZip() {
+    exportQrZip() {
         if (this.results.length === 0) {
             this.showStatus('沒有可匯出的數據', 'error');
             return;
@@ -986,8 +1201,15 @@ class SVLinkBatchGenerator {
             return;
         }
 
-        // 儲存結果到 sessionStorage 並打開 QR Gallery
-        sessionStorage.setItem('qr_results', JSON.stringify(this.results));
+        // sessionStorage 只保存短網址與原始網址，QR Code 由 Gallery 依網址向伺服器讀取
+        try {
+            sessionStorage.setItem('qr_items', JSON.stringify(successResults.map(r => [r.short, r.original])));
+        } catch (error) {
+            console.error('QR Code 預覽錯誤:', error);
+            this.showStatus(`QR Code 預覽失敗: ${error.message}`, 'error');
+            return;
+        }
+
         window.open('/qr-gallery', '_blank');
     }
 
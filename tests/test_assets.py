@@ -0,0 +1,47 @@
+"""
+靜態檔案測試：build-assets 預先產生的壓縮版本與未建置時的退回行為
+
+    python -m pytest -q
+"""
+
+import gzip
+import os
+import sys
+import tempfile
+
+import brotli
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SNAPSHOT_DB', os.path.join(tempfile.mkdtemp(), 'snapshots.db'))
+
+import app as svlink
+
+@pytest.fixture
+def build_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(svlink, 'ASSET_BUILD_DIR', str(tmp_path))
+    monkeypatch.setattr(svlink, '_assets', {})
+    return tmp_path
+
+def test_serves_identity_without_build(build_dir):
+    response = svlink.app.test_client().get('/static/js/app.js', headers={'Accept-Encoding': 'br, gzip'})
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == svlink.load_asset(svlink.STATIC_DIR, 'js/app.js')['variants']['identity']
+
+@pytest.mark.parametrize('path', ['/', '/qr-gallery', '/static/js/app.js', '/static/css/style.css'])
+def test_serves_prebuilt_variants(build_dir, path):
+    result = svlink.app.test_cli_runner().invoke(args=['build-assets'])
+    assert result.exit_code == 0
+    svlink._assets.clear()
+    
+    client = svlink.app.test_client()
+    identity = client.get(path, headers={'Accept-Encoding': 'identity'})
+    br = client.get(path, headers={'Accept-Encoding': 'br, gzip'})
+    gz = client.get(path, headers={'Accept-Encoding': 'gzip'})
+    
+    assert br.headers['Content-Encoding'] == 'br'
+    assert gz.headers['Content-Encoding'] == 'gzip'
+    assert brotli.decompress(br.data) == identity.data
+    assert gzip.decompress(gz.data) == identity.data
+    assert br.headers['ETag'] == identity.headers['ETag'][:-1] + '-br"'
@@ -0,0 +1,165 @@
+"""
+輸入前處理測試：canonicalize_url、url_dedupe_key 與 prepare_inputs
+
+    python -m pytest -q
+"""
+
+import os
+import random
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SNAPSHOT_DB', os.path.join(tempfile.mkdtemp(), 'snapshots.db'))
+
+import app as svlink
+
+def prepare_urls(lines):
+    dedupe_key = svlink.url_dedupe_key if svlink.has_tracking_params(lines) else None
+    return svlink.prepare_inputs(lines, svlink.canonicalize_url, svlink.FAST_URL_RE, dedupe_key)
+
+def prepare_short_links(lines):
+    return svlink.prepare_inputs(lines, svlink.short_link_address, svlink.FAST_SHORT_LINK_RE)
+
+def slow_prepare(lines, normalize, dedupe_key=None):
+    """逐行處理的參考實作，用來比對整段比對快速路徑的結果"""
+    entries = []
+    seen = {}
+    for index, line in enumerate(lines):
+        if not isinstance(line, str):
+            entries.append(('' if line is None else str(line), None, '格式錯誤', None))
+            continue
+        raw = line.strip()
+        if not raw:
+            entries.append((raw, None, '空白輸入', None))
+            continue
+        value, error = normalize(raw)
+        if error:
+            entries.append((raw, value, error, None))
+            continue
+        key = dedupe_key(value) if dedupe_key else value
+        entries.append((raw, value, None, seen.get(key)))
+        seen.setdefault(key, index)
+    return entries
+
+def random_urls(count, seed):
+    rng = random.Random(seed)
+    hosts = ['streetvoice.com', 'StreetVoice.COM', 'www.example.org', 'a-b.co', 'x.io']
+    paths = ['', '/', '/p', '/artist/songs/1/', '/A/B?']
+    params = ['utm_source=fb', 'UTM_medium=x', 'fbclid=abc', 'FBCLID', 'gclid=1', 'id=2', '', '_ga=1.2']
+    lines = []
+    for _ in range(count):
+        query = '&'.join(rng.choice(params) for _ in range(rng.randint(0, 3)))
+        line = (rng.choice(['', 'https://', 'http://', 'HTTP://'])
+                + rng.choice(hosts)
+                + rng.choice(['', ':443', ':80', ':8080'])
+                + rng.choice(paths)
+                + rng.choice(['', '?' + query])
+                + rng.choice(['', '#top']))
+        lines.append(rng.choice(['', ' ', '\t']) + line + rng.choice(['', ' ', '\r', ' \r']))
+    lines += ['', '   ', '\x1c', 'not a url', 'ftp://x.com/', 'https://', 'http://streetvoice.com']
+    rng.shuffle(lines)
+    return lines
+
+@pytest.mark.parametrize('url, expected', [
+    ('streetvoice.com', 'https://streetvoice.com/'),
+    ('HTTP://StreetVoice.com:80/A/b', 'http://streetvoice.com/A/b'),
+    ('https://streetvoice.com:443?x=1', 'https://streetvoice.com/?x=1'),
+    ('streetvoice.com:8080#top', 'https://streetvoice.com:8080/#top'),
+    ('https://streetvoice.com/?utm_source=fb&fbclid=1', 'https://streetvoice.com/?utm_source=fb&fbclid=1'),
+])
+def test_canonicalize_url_keeps_path_and_query(url, expected):
+    assert svlink.canonicalize_url(url) == (expected, None)
+
+@pytest.mark.parametrize('url', ['not a url', 'ftp://x.com/', 'https://', 'a b.com', '\x1c', 'streetvoice.123'])
+def test_canonicalize_url_rejects_invalid(url):
+    assert svlink.canonicalize_url(url) == (None, '網址格式錯誤')
+
+def test_fast_path_lines_are_already_canonical():
+    lines = [line.strip() for line in random_urls(2000, 1)]
+    for raw, value, rest in svlink.FAST_URL_RE.findall('\n'.join(lines)):
+        if value:
+            assert svlink.canonicalize_url(raw) == (raw, None)
+
+@pytest.mark.parametrize('seed', range(5))
+def test_prepare_inputs_matches_per_line_processing(seed):
+    lines = random_urls(1000, seed)
+    entries, stats = prepare_urls(lines)
+    assert entries == slow_prepare(lines, svlink.canonicalize_url, svlink.url_dedupe_key)
+    assert stats == {
+        'invalid': sum(1 for entry in entries if entry[2]),
+        'duplicates': sum(1 for entry in entries if entry[3] is not None)
+    }
+
+def test_prepare_inputs_one_entry_per_item():
+    lines = ['https://streetvoice.com/a', None, 1, '', '  ', '\x1c', {'url': 'x'}, 'streetvoice.com/b']
+    entries, stats = prepare_urls(lines)
+    assert [entry[0] for entry in entries] == [
+        'https://streetvoice.com/a', '', '1', '', '', '', "{'url': 'x'}", 'streetvoice.com/b'
+    ]
+    assert [entry[2] for entry in entries] == [
+        None, '格式錯誤', '格式錯誤', '空白輸入', '空白輸入', '空白輸入', '格式錯誤', None
+    ]
+    assert stats == {'invalid': 6, 'duplicates': 0}
+
+def test_prepare_inputs_handles_embedded_newlines():
+    lines = ['https://streetvoice.com/a\nhttps://streetvoice.com/b', 'https://streetvoice.com/c']
+    entries, _ = prepare_urls(lines)
+    assert len(entries) == 2
+    assert entries[0][2] == '網址格式錯誤'
+    assert entries[1] == ('https://streetvoice.com/c', 'https://streetvoice.com/c', None, None)
+
+def test_prepare_inputs_strips_carriage_returns():
+    lines = ['https://streetvoice.com/a\r', ' StreetVoice.com/b \r', 'https://sv.link/abc\r']
+    entries, _ = prepare_urls(lines)
+    assert entries[0] == ('https://streetvoice.com/a', 'https://streetvoice.com/a', None, None)
+    assert entries[1] == ('StreetVoice.com/b', 'https://streetvoice.com/b', None, None)
+
+    entries, _ = prepare_short_links(lines[2:])
+    assert entries == [('https://sv.link/abc', 'abc', None, None)]
+
+def test_prepare_inputs_duplicates():
+    lines = [
+        'https://streetvoice.com/a?id=1',
+        'StreetVoice.com/a?id=1&fbclid=xyz',
+        'https://streetvoice.com/a?id=1&utm_source=fb',
+        'https://streetvoice.com/a?id=1&utm_source=ig',
+        'https://streetvoice.com/a?id=1&utm_source=ig#top',
+        'https://streetvoice.com/a?id=1&utm_source=ig&GCLID=1',
+        'https://streetvoice.com/a?ID=1',
+    ]
+    entries, stats = prepare_urls(lines)
+    assert [entry[3] for entry in entries] == [None, 0, None, None, None, 3, None]
+    assert stats == {'invalid': 0, 'duplicates': 2}
+    # 送出的目標網址維持使用者輸入的查詢參數
+    assert entries[2][1] == 'https://streetvoice.com/a?id=1&utm_source=fb'
+
+def test_prepare_inputs_without_tracking_params_skips_dedupe_key():
+    lines = ['https://streetvoice.com/a?id=1', 'streetvoice.com/a?id=1', 'https://streetvoice.com/a?id=2']
+    assert not svlink.has_tracking_params(lines)
+    entries, stats = prepare_urls(lines)
+    assert [entry[3] for entry in entries] == [None, 0, None]
+    assert stats == {'invalid': 0, 'duplicates': 1}
+
+def test_url_dedupe_key():
+    key = svlink.url_dedupe_key
+    assert key('https://a.com/p') == 'https://a.com/p'
+    assert key('https://a.com/p?fbclid=1') == 'https://a.com/p'
+    assert key('https://a.com/p?a=1&Fbclid=2&b=3#f') == 'https://a.com/p?a=1&b=3#f'
+    assert key('https://a.com/p?utm_source=fb') == 'https://a.com/p?utm_source=fb'
+    assert key('https://a.com/p?fbclidx=1') == 'https://a.com/p?fbclidx=1'
+
+def test_prepare_short_links():
+    lines = ['https://sv.link/abc', ' sv.link/abc/ ', 'abc', 'SV.LINK/Def?x=1', 'https://example.com/abc', '']
+    entries, stats = prepare_short_links(lines)
+    assert entries == [
+        ('https://sv.link/abc', 'abc', None, None),
+        ('sv.link/abc/', 'abc', None, 0),
+        ('abc', 'abc', None, 0),
+        ('SV.LINK/Def?x=1', 'Def', None, None),
+        ('https://example.com/abc', None, '短網址格式錯誤', None),
+        ('', None, '空白輸入', None),
+    ]
+    assert stats == {'invalid': 2, 'duplicates': 2}
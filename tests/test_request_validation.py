@@ -0,0 +1,81 @@
+"""
+請求格式驗證測試：格式錯誤的請求回傳 400，不會進入 API 呼叫
+
+    python -m pytest -q
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SNAPSHOT_DB', os.path.join(tempfile.mkdtemp(), 'snapshots.db'))
+
+import app as svlink
+
+ENDPOINTS = [
+    ('/api/shorten', 'urls'),
+    ('/api/lookup', 'links'),
+    ('/api/batch-lookup', 'links'),
+    ('/api/batch-update', 'changes'),
+]
+
+@pytest.fixture
+def client():
+    return svlink.app.test_client()
+
+@pytest.mark.parametrize('endpoint, items_key', ENDPOINTS)
+@pytest.mark.parametrize('body, error', [
+    ([], '請求格式錯誤'),
+    ('text', '請求格式錯誤'),
+    ({'accounts': 'key'}, '請求格式錯誤'),
+    ({'accounts': [1, 2]}, '請求格式錯誤'),
+    ({'accounts': [{'api_key': 'key', 'ITEMS': ['x']}, None]}, '請求格式錯誤'),
+    ({'api_key': 123, 'ITEMS': ['x']}, '缺少 API Key'),
+    ({'api_key': ['key'], 'ITEMS': ['x']}, '缺少 API Key'),
+    ({'accounts': [{'api_key': 'key', 'ITEMS': ['x']}, {'api_key': {}, 'ITEMS': ['x']}]}, '缺少 API Key'),
+])
+def test_malformed_account_groups(client, endpoint, items_key, body, error):
+    body = json.loads(json.dumps(body).replace('"ITEMS"', json.dumps(items_key)))
+    response = client.post(endpoint, json=body)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': error}
+
+@pytest.mark.parametrize('endpoint, items_key', ENDPOINTS)
+@pytest.mark.parametrize('items', [None, [], 'https://streetvoice.com/', {'a': 1}])
+def test_missing_or_malformed_items(client, endpoint, items_key, items):
+    response = client.post(endpoint, json={'api_key': 'key', items_key: items})
+    assert response.status_code == 400
+    assert response.get_json()['error'] != '請求格式錯誤'
+
+def test_account_groups():
+    assert svlink.account_groups({'api_key': 'k', 'urls': ['a']}, 'urls') == [('k', ['a'])]
+    assert svlink.account_groups({'accounts': [], 'api_key': 'k'}, 'urls') == [('k', [])]
+    assert svlink.account_groups(
+        {'accounts': [{'api_key': 'a', 'urls': ['x']}, {'api_key': 'b'}]}, 'urls'
+    ) == [('a', ['x']), ('b', [])]
+    assert svlink.account_groups(None, 'urls') is None
+    assert svlink.account_groups({'accounts': [{'api_key': 'a'}, 'b']}, 'urls') is None
+
+@pytest.mark.parametrize('body, error', [
+    ([], '請求格式錯誤'),
+    ({'api_key': 5}, '缺少 API Key'),
+    ({'api_key': 'key', 'top': 'abc'}, 'top 必須為整數'),
+    ({'api_key': 'key', 'top': float('inf')}, 'top 必須為整數'),
+    ({'api_key': 'key', 'start': 123}, '時間格式錯誤，請使用 ISO 8601'),
+    ({'api_key': 'key', 'end': ['2024-01-01']}, '時間格式錯誤，請使用 ISO 8601'),
+    ({'api_key': 'key', 'start': '0001-01-01'}, '時間格式錯誤，請使用 ISO 8601'),
+    ({'api_key': 'key', 'links': 'https://sv.link/abc'}, 'links 必須為短網址清單'),
+])
+def test_malformed_snapshot_deltas(client, body, error):
+    response = client.post('/api/analytics/deltas', json=body)
+    assert response.status_code == 400
+    assert response.get_json() == {'error': error}
+
+def test_malformed_snapshot_request(client):
+    response = client.post('/api/analytics/snapshot', json=[])
+    assert response.status_code == 400
+    assert response.get_json() == {'error': '請求格式錯誤'}